@@ -0,0 +1,110 @@
+import copy
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """Ограниченный LRU-кеш токенов вместе с их пользователями.
+
+    Записи живут в памяти процесса не дольше ttl секунд. Если задан
+    shared_cache (алиас из CACHES), при сбросе токена в общий кеш
+    записывается время отзыва, и записи, загруженные из базы данных
+    раньше него, не используются ни в одном процессе. Сами токены
+    и пользователи в общий кеш не попадают.
+    """
+    def __init__(self, maxsize, ttl, shared_cache=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared_cache = shared_cache
+        self._lock = Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _revoked_key(key):
+        return 'auth_token_revoked:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def _pop(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def _revoked(self, key, loaded):
+        """Отозван ли токен после того, как был загружен в момент loaded."""
+        if not self.shared_cache:
+            return False
+        revoked = caches[self.shared_cache].get(self._revoked_key(key))
+        return revoked is not None and revoked >= loaded
+
+    def get(self, key):
+        """Копия закешированного токена или None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires, loaded = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        if self._revoked(key, loaded):
+            self._pop([key])
+            return None
+        return copy.deepcopy(token)
+
+    def set(self, key, token, loaded):
+        """Кеширует токен, прочитанный из базы данных после момента loaded
+        (time.time())."""
+        with self._lock:
+            self._entries[key] = (
+                token, time.monotonic() + self.ttl, loaded)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _revoke(self, keys):
+        self._pop(keys)
+        if self.shared_cache:
+            revoked = time.time()
+            caches[self.shared_cache].set_many(
+                {self._revoked_key(key): revoked for key in keys},
+                self.ttl * 2)
+
+    def invalidate(self, *keys):
+        """Удаляет токены keys из кеша этого процесса и после коммита
+        отзывает их во всех процессах."""
+        if not keys:
+            return
+        self._pop(keys)
+        transaction.on_commit(lambda: self._revoke(keys))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    settings.AUTH_TOKEN_CACHE_SIZE,
+    settings.AUTH_TOKEN_CACHE_TTL,
+    settings.AUTH_TOKEN_SHARED_CACHE,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который не обращается к базе данных, пока токен
+    с пользователем лежит в token_cache."""
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is not None:
+            return token.user, token
+        loaded = time.time()
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, token, loaded)
+        return user, token
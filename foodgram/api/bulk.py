@@ -0,0 +1,62 @@
+CREATED = 'created'
+EXISTS = 'exists'
+DELETED = 'deleted'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+
+
+def lock_ids(queryset):
+    """Блокирует строки queryset в порядке pk и возвращает их id.
+
+    FOR NO KEY UPDATE совместима с FOR KEY SHARE, которую берут вставки
+    связей с этими строками в других транзакциях (одиночные запросы
+    избранного, корзины и подписок), поэтому блокировка не приводит
+    к взаимной блокировке с ними и сериализует только пакетные запросы.
+    """
+    return list(
+        queryset.order_by('pk').select_for_update(no_key=True)
+        .values_list('pk', flat=True)
+    )
+
+
+def bulk_add(model, owner_field, owner, target_field, ids, valid_ids,
+             forbidden=()):
+    """Создаёт связи model владельца owner с объектами valid_ids.
+
+    Уже существующие связи определяются одним запросом, новые вставляются
+    одним bulk_create. Возвращает id созданных связей и статусы по каждому
+    id из ids. Сигналы post_save при этом не отправляются. Параллельный
+    запрос может успеть создать те же связи, поэтому счётчики объектов
+    из результата пересчитываются по таблице, а не увеличиваются на 1;
+    строки valid_ids блокируются до вызова через lock_ids.
+    """
+    existing = set(
+        model.objects.filter(**{
+            owner_field: owner, f'{target_field}__in': valid_ids})
+        .values_list(target_field, flat=True)
+    )
+    created = [pk for pk in valid_ids if pk not in existing]
+    model.objects.bulk_create(
+        (model(**{owner_field: owner, f'{target_field}_id': pk})
+         for pk in created),
+        ignore_conflicts=True,
+    )
+    statuses = dict.fromkeys(forbidden, FORBIDDEN)
+    statuses.update(dict.fromkeys(existing, EXISTS))
+    statuses.update(dict.fromkeys(created, CREATED))
+    return created, _results(ids, statuses)
+
+
+def bulk_remove(model, owner_field, owner, target_field, ids):
+    """Удаляет связи model владельца owner с объектами ids."""
+    queryset = model.objects.filter(**{
+        owner_field: owner, f'{target_field}__in': ids})
+    removed = set(queryset.values_list(target_field, flat=True))
+    queryset.delete()
+    return _results(ids, dict.fromkeys(removed, DELETED))
+
+
+def _results(ids, statuses):
+    return {'results': [
+        {'id': pk, 'status': statuses.get(pk, NOT_FOUND)} for pk in ids
+    ]}
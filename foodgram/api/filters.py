@@ -1,9 +1,35 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
 from django_filters import rest_framework as filters
+from recipes.indexes import ingredient_recipe_index
 from recipes.models import Recipe, Tag
+from rest_framework.exceptions import ValidationError
 
 User = get_user_model()
 
+SEARCH_CONFIG = 'russian'
+
+
+def id_list(ids):
+    """Список id для фильтра pk__in одним параметром запроса (массив
+    в PostgreSQL, JSON в SQLite), а не отдельным параметром на каждый id,
+    поэтому длина списка не упирается в лимит параметров базы данных."""
+    if connection.vendor == 'postgresql':
+        return RawSQL('SELECT unnest(%s::bigint[])', (list(ids),))
+    if connection.vendor == 'sqlite':
+        return RawSQL('SELECT value FROM json_each(%s)', (json.dumps(ids),))
+    return ids
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """Список чисел через запятую."""
+
 
 class RecipeFilter(filters.FilterSet):
     """Фильтры для рецептов."""
@@ -17,18 +43,50 @@ class RecipeFilter(filters.FilterSet):
         field_name='is_favorited', method='filter_nonmodel_fields')
     is_in_shopping_cart = filters.BooleanFilter(
         field_name='is_in_shopping_cart', method='filter_nonmodel_fields')
+    search = filters.CharFilter(method='filter_search')
+    ingredients = NumberInFilter(method='filter_ingredients')
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags',)
 
     def filter_nonmodel_fields(self, queryset, name, value):
-        if self.request.user.is_anonymous:
+        """Фильтрует по флагам, аннотированным в RecipeViewSet."""
+        if self.request.user.is_anonymous or not value:
+            return queryset
+        return queryset.filter(**{name: True})
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию с сортировкой по
+        релевантности. В PostgreSQL используется search_vector с GIN-индексом,
+        в остальных базах — поиск подстроки, где совпадение в названии
+        важнее совпадения в описании."""
+        value = value.strip()
+        if not value:
             return queryset
-        if name == 'is_in_shopping_cart' and value:
-            return queryset.filter(
-                shopping_cart__user=self.request.user)
-        if name == 'is_favorited' and value:
-            return queryset.filter(
-                favorites__user=self.request.user)
-        return queryset
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(
+                value, config=SEARCH_CONFIG, search_type='websearch')
+            queryset = queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query))
+        else:
+            queryset = queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value)
+            ).annotate(search_rank=Case(
+                When(name__icontains=value, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ))
+        return queryset.order_by('-search_rank', '-created', '-id')
+
+    def filter_ingredients(self, queryset, name, value):
+        """Рецепты, содержащие все перечисленные ингредиенты. Подходящие
+        рецепты находятся по инвертированному индексу без соединений
+        с RecipeIngredient и передаются в запрос одним параметром."""
+        if len(value) > settings.INGREDIENT_MATCH_MAX_IDS:
+            raise ValidationError({name: (
+                f'Не больше {settings.INGREDIENT_MATCH_MAX_IDS} '
+                'ингредиентов.')})
+        ranked = ingredient_recipe_index.search(int(pk) for pk in value)
+        return queryset.filter(
+            pk__in=id_list([recipe_id for recipe_id, _ in ranked]))
@@ -0,0 +1,154 @@
+import json
+import os
+import time
+import uuid
+
+from django.conf import settings
+
+from .shopping_list import render_pdf
+from .workers import get_executor
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _path(job_id, ext):
+    return os.path.join(settings.SHOPPING_LIST_JOBS_DIR, f'{job_id}.{ext}')
+
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_meta(job_id, user_id, status):
+    _write_atomic(
+        _path(job_id, 'json'),
+        json.dumps({'user': user_id, 'status': status}).encode()
+    )
+
+
+def _read_meta(job_id):
+    with open(_path(job_id, 'json'), 'rb') as file:
+        return json.load(file)
+
+
+def _claim(job_id):
+    """Забирает входные данные задания. Переименование атомарно, поэтому
+    задание выполняет только один процесс; возвращает None, если его уже
+    забрали. Время изменения обновляется до переименования: по нему
+    _recover отсчитывает время выполнения и не должен увидеть только что
+    забранное задание устаревшим."""
+    path, claimed = _path(job_id, 'input'), _path(job_id, 'claimed')
+    try:
+        os.utime(path)
+        os.rename(path, claimed)
+    except FileNotFoundError:
+        return None
+    with open(claimed, 'rb') as file:
+        return json.load(file)
+
+
+def _render(job_id):
+    """Выполняется в процессе пула: рисует PDF и сохраняет его на диск."""
+    job = _claim(job_id)
+    if job is None:
+        return
+    try:
+        _write_atomic(_path(job_id, 'pdf'), render_pdf(job['shopping_list']))
+        _write_meta(job_id, job['user'], DONE)
+    except Exception:
+        _write_meta(job_id, job['user'], FAILED)
+        raise
+    finally:
+        os.remove(_path(job_id, 'claimed'))
+
+
+def _submit(job_id):
+    get_executor(
+        'shopping_list', settings.SHOPPING_LIST_WORKERS
+    ).submit(_render, job_id)
+
+
+def _age(path):
+    """Возраст файла в секундах или None, если файла нет."""
+    try:
+        return time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _recover(job_id, user_id):
+    """Задание в статусе pending, которое, возможно, потеряно вместе
+    с пулом перезапущенного процесса. Незабранные входные данные старше
+    SHOPPING_LIST_JOB_RETRY_AFTER секунд отправляются в пул этого
+    процесса, забранные и не выполненные за SHOPPING_LIST_JOB_TIMEOUT
+    секунд, как и задания без входных данных, считаются упавшими."""
+    waiting = _age(_path(job_id, 'input'))
+    if waiting is not None:
+        if waiting > settings.SHOPPING_LIST_JOB_RETRY_AFTER:
+            try:
+                os.utime(_path(job_id, 'input'))
+            except FileNotFoundError:
+                return PENDING
+            _submit(job_id)
+        return PENDING
+    running = _age(_path(job_id, 'claimed'))
+    if running is not None and running <= settings.SHOPPING_LIST_JOB_TIMEOUT:
+        return PENDING
+    status = _read_meta(job_id)['status']
+    if status == PENDING:
+        _write_meta(job_id, user_id, FAILED)
+        return FAILED
+    return status
+
+
+def _cleanup():
+    """Удаляет файлы заданий старше SHOPPING_LIST_JOB_TTL секунд."""
+    expired = time.time() - settings.SHOPPING_LIST_JOB_TTL
+    for entry in os.scandir(settings.SHOPPING_LIST_JOBS_DIR):
+        if entry.stat().st_mtime < expired:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def enqueue(user, shopping_list, pdf=None):
+    """Ставит отрисовку списка покупок в очередь и возвращает id задания.
+    Если готовый PDF уже есть в кеше, задание сразу создаётся выполненным.
+    Входные данные задания сохраняются в каталоге заданий, поэтому его
+    может выполнить любой процесс, если пул этого будет потерян.
+    """
+    os.makedirs(settings.SHOPPING_LIST_JOBS_DIR, exist_ok=True)
+    _cleanup()
+    job_id = str(uuid.uuid4())
+    if pdf is not None:
+        _write_atomic(_path(job_id, 'pdf'), pdf)
+        _write_meta(job_id, user.pk, DONE)
+        return job_id
+    _write_atomic(_path(job_id, 'input'), json.dumps(
+        {'user': user.pk, 'shopping_list': shopping_list}).encode())
+    _write_meta(job_id, user.pk, PENDING)
+    _submit(job_id)
+    return job_id
+
+
+def get_status(job_id, user):
+    """Возвращает статус задания пользователя или None, если его нет."""
+    try:
+        meta = _read_meta(job_id)
+    except FileNotFoundError:
+        return None
+    if meta['user'] != user.pk:
+        return None
+    if meta['status'] == PENDING:
+        return _recover(job_id, user.pk)
+    return meta['status']
+
+
+def get_result_path(job_id):
+    return _path(job_id, 'pdf')
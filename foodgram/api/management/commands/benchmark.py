@@ -0,0 +1,297 @@
+import base64
+import json
+import random
+import subprocess
+import time
+from io import BytesIO
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+CARD_FIELDS = 'id,name,image,thumbnails,cooking_time,is_favorited'
+
+
+def percentile(values, share):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1,
+                       round(share * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def image_payload():
+    image = BytesIO()
+    Image.new('RGB', (600, 400), (120, 180, 230)).save(image, 'JPEG')
+    return ('data:image/jpeg;base64,'
+            + base64.b64encode(image.getvalue()).decode())
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест API на текущей базе данных: задержки p50/p95, '
+            'запросы к БД и пропускная способность по сценариям.')
+
+    SCENARIOS = (
+        'recipes_anonymous', 'recipes_authenticated', 'recipes_sparse',
+        'recipes_by_tags',
+        'recipes_by_author', 'recipes_favorited', 'recipes_in_cart',
+        'recipes_search', 'recipes_by_ingredients', 'ingredient_match',
+        'recipe_detail', 'recipe_similar', 'recipe_create', 'recipe_update',
+        'ingredient_search', 'users', 'users_sparse', 'subscriptions',
+        'shopping_list_pdf',
+        'shopping_list_txt',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Количество замеряемых запросов в каждом сценарии.')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--scenario', action='append', choices=self.SCENARIOS,
+            help='Запустить только указанные сценарии.')
+        parser.add_argument(
+            '--user', help='Email пользователя для авторизованных запросов.')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--label', default='')
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument(
+            '--compare', help='JSON с предыдущими результатами для сравнения.')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.setup(options)
+        results = {}
+        try:
+            for name in options['scenario'] or self.SCENARIOS:
+                results[name] = self.run_scenario(
+                    name, options['requests'], options['warmup'])
+        finally:
+            Recipe.objects.filter(pk__in=self.created).delete()
+        report = {'meta': self.get_meta(options['label']),
+                  'results': results}
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)['results']
+        self.print_report(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+    def setup(self, options):
+        if options['user']:
+            self.user = User.objects.filter(email=options['user']).first()
+        else:
+            self.user = (
+                User.objects.filter(
+                    shopping_cart__isnull=False, subscriber__isnull=False)
+                .order_by('pk').first()
+            )
+        if self.user is None or not Recipe.objects.exists():
+            raise CommandError(
+                'Нет данных для теста, сначала выполните seed_data.')
+        self.anonymous = APIClient(HTTP_HOST=options['host'])
+        self.client = APIClient(HTTP_HOST=options['host'])
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.recipes = list(
+            Recipe.objects.order_by('?').values_list('pk', flat=True)[:500])
+        self.authors = list(
+            Recipe.objects.order_by().values_list('author', flat=True)
+            .distinct()[:100])
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+        self.tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        self.ingredients = list(
+            Ingredient.objects.order_by('?').values_list('pk', flat=True)
+            [:200])
+        self.prefixes = list({
+            name[:random.randint(1, 3)] for name in
+            Ingredient.objects.order_by('?').values_list('name', flat=True)
+            [:200]
+        })
+        self.words = list({
+            word for name in
+            Recipe.objects.order_by('?').values_list('name', flat=True)[:200]
+            for word in name.split() if len(word) > 2
+        })
+        self.ingredient_sets = [
+            ','.join(map(str, RecipeIngredient.objects.filter(
+                recipe=pk).values_list('ingredient', flat=True)[:3]))
+            for pk in self.recipes[:50]
+        ]
+        self.image = image_payload()
+        self.created = []
+        response = self.client.post(
+            '/api/recipes/', self.recipe_payload(), format='json')
+        if response.status_code != 201:
+            raise CommandError(
+                f'Не удалось создать рецепт: {response.status_code}')
+        self.created.append(response.json()['id'])
+
+    def recipe_payload(self):
+        return {
+            'name': f'Тестовый рецепт {random.randrange(10 ** 6)}',
+            'text': 'Рецепт нагрузочного теста.',
+            'cooking_time': random.randint(5, 120),
+            'image': self.image,
+            'tags': random.sample(
+                self.tag_ids, random.randint(1, len(self.tag_ids))),
+            'ingredients': [
+                {'id': pk, 'amount': random.randint(1, 500)}
+                for pk in random.sample(
+                    self.ingredients, min(8, len(self.ingredients)))
+            ],
+        }
+
+    def get_request(self, name):
+        """Клиент, метод, адрес и тело запроса сценария name."""
+        if name == 'recipes_anonymous':
+            return self.anonymous, 'get', '/api/recipes/', None
+        if name == 'recipes_authenticated':
+            return self.client, 'get', '/api/recipes/', None
+        if name == 'recipes_sparse':
+            return (self.client, 'get',
+                    f'/api/recipes/?fields={CARD_FIELDS}', None)
+        if name == 'recipes_by_tags':
+            tags = '&'.join(f'tags={slug}' for slug in random.sample(
+                self.tags, random.randint(1, len(self.tags))))
+            return self.client, 'get', f'/api/recipes/?{tags}', None
+        if name == 'recipes_by_author':
+            return (self.client, 'get',
+                    f'/api/recipes/?author={random.choice(self.authors)}',
+                    None)
+        if name == 'recipes_favorited':
+            return self.client, 'get', '/api/recipes/?is_favorited=1', None
+        if name == 'recipes_in_cart':
+            return (self.client, 'get',
+                    '/api/recipes/?is_in_shopping_cart=1', None)
+        if name == 'recipes_search':
+            word = quote(random.choice(self.words))
+            return self.client, 'get', f'/api/recipes/?search={word}', None
+        if name == 'recipes_by_ingredients':
+            ingredients = random.choice(self.ingredient_sets)
+            return (self.client, 'get',
+                    f'/api/recipes/?ingredients={ingredients}', None)
+        if name == 'ingredient_match':
+            ingredients = random.choice(self.ingredient_sets)
+            return (self.client, 'get',
+                    f'/api/recipes/by_ingredients/?ingredients={ingredients}'
+                    '&min_matches=2', None)
+        if name == 'recipe_detail':
+            return (self.client, 'get',
+                    f'/api/recipes/{random.choice(self.recipes)}/', None)
+        if name == 'recipe_similar':
+            return (self.client, 'get',
+                    f'/api/recipes/{random.choice(self.recipes)}/similar/',
+                    None)
+        if name == 'recipe_create':
+            return self.client, 'post', '/api/recipes/', self.recipe_payload()
+        if name == 'recipe_update':
+            return (self.client, 'patch', f'/api/recipes/{self.created[0]}/',
+                    self.recipe_payload())
+        if name == 'ingredient_search':
+            prefix = quote(random.choice(self.prefixes))
+            return (self.anonymous, 'get', f'/api/ingredients/?name={prefix}',
+                    None)
+        if name == 'users':
+            return self.client, 'get', '/api/users/', None
+        if name == 'users_sparse':
+            return (self.client, 'get',
+                    '/api/users/?omit=recipes,recipes_count', None)
+        if name == 'subscriptions':
+            return (self.client, 'get',
+                    '/api/users/subscriptions/?recipes_limit=3', None)
+        if name == 'shopping_list_pdf':
+            return (self.client, 'get',
+                    '/api/recipes/download_shopping_cart/?format=pdf', None)
+        return (self.client, 'get',
+                '/api/recipes/download_shopping_cart/?format=txt', None)
+
+    def request(self, name):
+        """Выполняет запрос сценария и возвращает время, число запросов
+        к БД и признак ошибки."""
+        client, method, url, data = self.get_request(name)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            if data is None:
+                response = getattr(client, method)(url)
+            else:
+                response = getattr(client, method)(url, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        response.close()
+        if name == 'recipe_create' and response.status_code == 201:
+            self.created.append(response.json()['id'])
+        return elapsed, len(queries), response.status_code >= 400
+
+    def run_scenario(self, name, requests, warmup):
+        for _ in range(warmup):
+            self.request(name)
+        timings, queries, errors = [], [], 0
+        for _ in range(requests):
+            elapsed, count, failed = self.request(name)
+            timings.append(elapsed)
+            queries.append(count)
+            errors += failed
+        return {
+            'requests': requests,
+            'errors': errors,
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'mean_ms': round(sum(timings) / requests * 1000, 2),
+            'queries_mean': round(sum(queries) / requests, 2),
+            'queries_max': max(queries),
+            'throughput_rps': round(requests / sum(timings), 1),
+        }
+
+    def get_meta(self, label):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except OSError:
+            commit = ''
+        return {
+            'label': label,
+            'commit': commit,
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'renderer': api_settings.DEFAULT_RENDERER_CLASSES[0].__name__,
+            'users': User.objects.count(),
+            'recipes': Recipe.objects.count(),
+            'ingredients': Ingredient.objects.count(),
+        }
+
+    def print_report(self, results, baseline=None):
+        self.stdout.write(
+            f'{"сценарий":<24}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"запросы":>10}{"rps":>9}{"ошибки":>8}')
+        for name, result in results.items():
+            line = (
+                f'{name:<24}{result["p50_ms"]:>10}{result["p95_ms"]:>10}'
+                f'{result["queries_mean"]:>10}{result["throughput_rps"]:>9}'
+                f'{result["errors"]:>8}'
+            )
+            previous = (baseline or {}).get(name)
+            if previous:
+                line += '  p50 {:+.0%}, p95 {:+.0%}'.format(
+                    result['p50_ms'] / previous['p50_ms'] - 1,
+                    result['p95_ms'] / previous['p95_ms'] - 1,
+                )
+            self.stdout.write(line)
@@ -0,0 +1,101 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+serializer_timer = ContextVar('serializer_timer', default=None)
+
+
+class Histogram:
+    """Гистограмма в памяти процесса с отдельной серией на каждый view."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._lock = Lock()
+        self._series = {}
+
+    def observe(self, view, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                series = self._series[view] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """Строки гистограммы в текстовом формате Prometheus."""
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(
+                (view, list(counts), total, count)
+                for view, (counts, total, count) in self._series.items()
+            )
+        for view, counts, total, count in series:
+            label = view.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket
+                lines.append(f'{self.name}_bucket{{view="{label}",'
+                             f'le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{view="{label}"}} {total}')
+            lines.append(f'{self.name}_count{{view="{label}"}} {count}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса.', DURATION_BUCKETS)
+DB_QUERIES = Histogram(
+    'foodgram_db_queries',
+    'Количество запросов к базе данных за запрос.', QUERY_BUCKETS)
+DB_DURATION = Histogram(
+    'foodgram_db_duration_seconds',
+    'Время выполнения запросов к базе данных.', DURATION_BUCKETS)
+SERIALIZER_DURATION = Histogram(
+    'foodgram_serializer_duration_seconds',
+    'Время сериализации ответа.', DURATION_BUCKETS)
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, SERIALIZER_DURATION)
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+class SerializerTimer:
+    """Время сериализации в рамках одного запроса."""
+    __slots__ = ('depth', 'total')
+
+    def __init__(self):
+        self.depth = 0
+        self.total = 0.0
+
+
+class TimedSerializerMixin:
+    """Учитывает время to_representation во времени сериализации запроса.
+    Вложенные сериализаторы повторно не учитываются."""
+
+    def to_representation(self, instance):
+        timer = serializer_timer.get()
+        if timer is None:
+            return super().to_representation(instance)
+        timer.depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timer.depth -= 1
+            if not timer.depth:
+                timer.total += time.perf_counter() - start
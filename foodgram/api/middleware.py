@@ -0,0 +1,93 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import (DB_DURATION, DB_QUERIES, REQUEST_DURATION,
+                      SERIALIZER_DURATION, SerializerTimer, serializer_timer)
+
+logger = logging.getLogger('api.metrics')
+
+
+def get_view_name(request):
+    """Имя view и действия, например RecipeViewSet.list."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name or match.func.__name__
+    method = request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper, считающая запросы к базе данных и их время.
+    При capture сохраняет и текст запросов."""
+
+    def __init__(self, capture=False):
+        self.capture = capture
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if self.capture:
+                self.queries.append((duration, sql))
+
+
+class MetricsMiddleware:
+    """Собирает для каждого view время ответа, число и время запросов к базе
+    данных и время сериализации. Запросы дольше SLOW_REQUEST_THRESHOLD
+    миллисекунд пишутся в лог api.metrics вместе с их SQL."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder(capture=bool(settings.SLOW_REQUEST_THRESHOLD))
+        timer = SerializerTimer()
+        token = serializer_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            serializer_timer.reset(token)
+        duration = time.perf_counter() - start
+        view = get_view_name(request)
+        REQUEST_DURATION.observe(view, duration)
+        DB_QUERIES.observe(view, recorder.count)
+        DB_DURATION.observe(view, recorder.duration)
+        SERIALIZER_DURATION.observe(view, timer.total)
+        if recorder.capture and (
+                duration * 1000 >= settings.SLOW_REQUEST_THRESHOLD):
+            self.log_slow_request(request, view, duration, recorder)
+        return response
+
+    def log_slow_request(self, request, view, duration, recorder):
+        queries = '\n'.join(
+            f'  {query_duration * 1000:.1f} ms: {sql}'
+            for query_duration, sql in recorder.queries
+        )
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.1f ms, %d запросов к БД '
+            '(%.1f ms)\n%s',
+            request.method, request.get_full_path(), view, duration * 1000,
+            recorder.count, recorder.duration * 1000, queries,
+        )
@@ -0,0 +1,99 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag, urlencode
+from recipes.cache import get_version
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+
+
+class CachedListMixin:
+    """Отдаёт список из кеша в виде готового JSON со строгим ETag.
+
+    Тело ответа кешируется для каждого набора параметров запроса и
+    версии данных cache_version_key, которую сбрасывают сигналы моделей.
+    Заголовок Cache-Control позволяет кешировать ответ и в nginx.
+    """
+    cache_version_key = None
+
+    def get_list_data(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs).data
+
+    def list(self, request, *args, **kwargs):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        key = 'list:{}:{}:{}'.format(
+            self.basename,
+            get_version(self.cache_version_key),
+            md5(query.encode()).hexdigest(),
+        )
+        body = cache.get(key)
+        if body is None:
+            body = JSONRenderer().render(
+                self.get_list_data(request, *args, **kwargs))
+            cache.set(key, body, settings.CATALOG_CACHE_TIMEOUT)
+        etag = quote_etag(md5(body).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                body, content_type=JSONRenderer.media_type)
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE)
+        return response
+
+
+class FieldsetMixin:
+    """Частичный ответ по параметрам fields и omit.
+
+    fields=id,name оставляет в ответе только перечисленные поля, omit=text
+    убирает перечисленные. Набор полей передаётся сериализатору в контексте
+    и доступен в get_queryset через get_requested_fields, чтобы не загружать
+    из базы данных то, что не попадёт в ответ. Применяется только
+    к запросам на чтение.
+    """
+    fields_param = 'fields'
+    omit_param = 'omit'
+
+    def get_param_list(self, name):
+        return {
+            field.strip()
+            for value in self.request.query_params.getlist(name)
+            for field in value.split(',') if field.strip()
+        }
+
+    def get_requested_fields(self):
+        """Поля ответа или None, если нужны все."""
+        if hasattr(self, '_requested_fields'):
+            return self._requested_fields
+        self._requested_fields = None
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+        fields = self.get_param_list(self.fields_param)
+        omit = self.get_param_list(self.omit_param)
+        if not fields and not omit:
+            return None
+        available = self.get_serializer_class().Meta.fields
+        for param, names in ((self.fields_param, fields),
+                             (self.omit_param, omit)):
+            unknown = names.difference(available)
+            if unknown:
+                raise ValidationError({param: 'Неизвестные поля: {}.'.format(
+                    ', '.join(sorted(unknown)))})
+        self._requested_fields = frozenset(
+            field for field in available
+            if (not fields or field in fields) and field not in omit
+        )
+        return self._requested_fields
+
+    def wants_field(self, name):
+        fields = self.get_requested_fields()
+        return fields is None or name in fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+        return context
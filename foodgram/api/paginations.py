@@ -1,7 +1,95 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = "limit"
     max_page_size = 20
+
+
+class LimitCursorPagination(CursorPagination):
+    """Пагинация по курсору (created, id) без COUNT(*) и OFFSET.
+
+    Общее количество объектов отдаётся только при включённой настройке
+    CURSOR_PAGINATION_COUNT и кешируется на CURSOR_PAGINATION_COUNT_TIMEOUT
+    секунд для каждого варианта запроса.
+    """
+    page_size = 6
+    page_size_query_param = "limit"
+    max_page_size = 20
+    ordering = ('-created', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        """Результаты поиска листаются в порядке релевантности."""
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', '-id')
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if settings.CURSOR_PAGINATION_COUNT:
+            self.count = self.get_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset):
+        """Возвращает закешированное количество объектов в выборке."""
+        key = 'pagination-count:' + md5(
+            str(queryset.query).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.CURSOR_PAGINATION_COUNT_TIMEOUT)
+        return count
+
+    def get_paginated_response(self, data):
+        return self.build_response(
+            data, self.get_next_link(), self.get_previous_link())
+
+    def build_response(self, data, next_link, previous_link):
+        response = OrderedDict([
+            ('next', next_link),
+            ('previous', previous_link),
+            ('results', data),
+        ])
+        if self.count is not None:
+            response['count'] = self.count
+            response.move_to_end('count', last=False)
+        return Response(response)
+
+    def encode_cursor(self, cursor):
+        self.last_cursor = cursor
+        return super().encode_cursor(cursor)
+
+    def get_page_state(self, page):
+        """Состояние текущей страницы для кеширования: id объектов, курсор
+        следующей страницы и количество. Хранится сам курсор, а не ссылка,
+        потому что ссылка содержит параметры исходного запроса."""
+        self.last_cursor = None
+        has_next = self.get_next_link() is not None
+        return {
+            'ids': [obj.pk for obj in page],
+            'next': tuple(self.last_cursor) if has_next else None,
+            'count': self.count,
+        }
+
+    def get_cached_response(self, request, data, state):
+        """Ответ для первой страницы, восстановленной из get_page_state.
+        Ссылка на следующую страницу строится от текущего запроса."""
+        self.count = state['count']
+        self.base_url = request.build_absolute_uri()
+        next_link = None
+        if state['next'] is not None:
+            next_link = self.encode_cursor(Cursor(*state['next']))
+        return self.build_response(data, next_link, None)
+
+
+class UserCursorPagination(LimitCursorPagination):
+    """Пагинация по курсору для пользователей и подписок."""
+    ordering = ('id',)
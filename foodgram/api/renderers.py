@@ -0,0 +1,65 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class PassthroughRenderer(BaseRenderer):
+    """Рендерер для согласования формата выгрузки.
+
+    Представления с такими рендерерами сами формируют тело ответа, поэтому
+    данные отдаются без изменений.
+    """
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class PDFRenderer(PassthroughRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class PlainTextRenderer(PassthroughRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+    render_style = 'text'
+
+
+class CSVRenderer(PlainTextRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class JSONExportRenderer(PlainTextRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson для компактного вывода в UTF-8.
+
+    Даты, Decimal, UUID и прочие типы, которые orjson не выводит так же,
+    как стандартный рендерер, передаются в encoder_class. Отличается только
+    запись чисел с плавающей точкой в экспоненциальной форме (1e-7 вместо
+    1e-07) и NaN/Infinity, которые выводятся как null. Без orjson, а также
+    для вывода с отступами или в ASCII используется стандартная
+    реализация.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact or self.get_indent(
+                    accepted_media_type, renderer_context or {}) is not None):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        return orjson.dumps(
+            data, default=self.encoder_class().default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        ).replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
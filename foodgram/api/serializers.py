@@ -1,26 +1,73 @@
 import base64
+import binascii
+from functools import partial
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
 from djoser.serializers import UserSerializer as DjoserUserSerializer
+from PIL import Image
+from recipes.images import make_thumbnails, on_thumbnails_done, thumbnail_url
+from recipes.indexes import ingredient_recipe_index
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.services import (cart_holders, defer_refresh,
+                              refresh_shopping_lists)
+from recipes.similarity import similar_recipes
 from rest_framework import serializers
 from users.models import Subscription
 
+from .metrics import TimedSerializerMixin
+from .workers import get_executor
+
 User = get_user_model()
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class FieldsetSerializerMixin:
+    """Оставляет в ответе только поля из context['fields'], заданные
+    FieldsetMixin представления. Вложенные сериализаторы выводятся
+    полностью."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.context.get('fields')
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if selected is None or parent is not None:
+            return fields
+        return {name: field for name, field in fields.items()
+                if name in selected}
+
+
+class ThumbnailsMixin(serializers.Serializer):
+    """Ссылки на миниатюры изображения рецепта."""
+    thumbnails = serializers.SerializerMethodField()
+
+    def get_thumbnails(self, obj):
+        request = self.context.get('request')
+        thumbnails = {}
+        for size in settings.THUMBNAIL_SIZES:
+            url = thumbnail_url(obj.image, size, obj.thumbnails_image)
+            if url and request is not None:
+                url = request.build_absolute_uri(url)
+            thumbnails[size] = url
+        return thumbnails
+
+
+class RecipeListSerializer(TimedSerializerMixin, ThumbnailsMixin,
+                           serializers.ModelSerializer):
     """Сериализатор списка рецептов."""
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'thumbnails', 'cooking_time')
         read_only_fields = '__all__',
 
 
-class UserSerializer(DjoserUserSerializer):
+class UserSerializer(TimedSerializerMixin, FieldsetSerializerMixin,
+                     DjoserUserSerializer):
     """Сериализатор пользователей."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -30,6 +77,8 @@ class UserSerializer(DjoserUserSerializer):
                   'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         current_user = self.context.get('request').user
         if current_user.is_anonymous:
             return False
@@ -37,23 +86,33 @@ class UserSerializer(DjoserUserSerializer):
             author=obj, subscriber=current_user).exists()
 
 
+class RecipesLimitSerializer(serializers.Serializer):
+    """Число рецептов каждого автора в списках подписок."""
+    recipes_limit = serializers.IntegerField(min_value=0, required=False)
+
+
+def get_recipes_limit(request):
+    """Проверенный параметр recipes_limit или None, если он не передан."""
+    params = RecipesLimitSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    return params.validated_data.get('recipes_limit')
+
+
 class SubscriptionSerializer(UserSerializer):
     """Сериализатор подписок."""
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
     recipes = serializers.SerializerMethodField()
 
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count',)
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
+        if hasattr(obj, 'page_recipes'):
+            return RecipeListSerializer(obj.page_recipes, many=True).data
+        limit = get_recipes_limit(self.context['request'])
         recipes = Recipe.objects.filter(author=obj)
-        if limit:
-            recipes = recipes[:int(limit)]
+        if limit is not None:
+            recipes = recipes[:limit]
         return RecipeListSerializer(recipes, many=True).data
 
     def validate(self, data):
@@ -70,14 +129,16 @@ class SubscriptionSerializer(UserSerializer):
         return data
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализатор ингредиентов."""
     class Meta:
         model = Ingredient
         fields = '__all__'
 
 
-class RecipeIngredientSerializer(serializers.ModelSerializer):
+class RecipeIngredientSerializer(TimedSerializerMixin,
+                                 serializers.ModelSerializer):
     """Сериализатор ингредиентов промежуточной модели."""
     id = serializers.ReadOnlyField(source='ingredient.id')
     name = serializers.ReadOnlyField(source='ingredient.name')
@@ -95,7 +156,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         )
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор тэгов."""
     class Meta:
         model = Tag
@@ -103,17 +164,49 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
-    """Сериализатор декодирования изображений."""
+    """Сериализатор декодирования изображений.
+
+    Строка base64 декодируется частями во временный файл, а Pillow
+    проверяет изображение по файлу, не загружая его целиком в память.
+    Переводы строк и пробелы внутри base64 отбрасываются до декодирования.
+    """
+    chunk_size = 64 * 1024
+
+    def decode(self, imgstr, name, content_type):
+        upload = TemporaryUploadedFile(name, content_type, 0, None)
+        imgstr = ''.join(imgstr.split())
+        try:
+            for start in range(0, len(imgstr), self.chunk_size):
+                upload.write(base64.b64decode(
+                    imgstr[start:start + self.chunk_size], validate=True))
+        except binascii.Error:
+            upload.close()
+            raise serializers.ValidationError(
+                'Изображение повреждено или имеет неверный формат.')
+        upload.size = upload.tell()
+        upload.seek(0)
+        return upload
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            name = {self.context["request"].user.username}
-            data = ContentFile(base64.b64decode(imgstr), name=f'{name}.' + ext)
+            content_type = format[len('data:'):]
+            ext = content_type.split('/')[-1]
+            name = self.context['request'].user.username
+            data = self.decode(imgstr, f'{name}.{ext}', content_type)
+            try:
+                with Image.open(data.temporary_file_path()) as image:
+                    width, height = image.size
+            except (OSError, Image.DecompressionBombError):
+                width = height = 0
+            if width * height > settings.IMAGE_MAX_PIXELS:
+                raise serializers.ValidationError(
+                    'Изображение слишком большое.')
         return super().to_internal_value(data)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, FieldsetSerializerMixin,
+                       ThumbnailsMixin, serializers.ModelSerializer):
     """Сериализатор рецептов."""
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
@@ -126,8 +219,8 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'is_in_shopping_cart', 'name', 'image', 'thumbnails',
+                  'text', 'cooking_time')
 
     def validate(self, data):
         for field in ('tags', 'ingredients', 'name', 'text', 'cooking_time'):
@@ -154,7 +247,14 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Рецепт уже добавлен.')
         return data
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         current_user = self.context['request'].user
         if current_user.is_anonymous:
             return False
@@ -162,17 +262,41 @@ class RecipeSerializer(serializers.ModelSerializer):
             recipe=obj, user=current_user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         current_user = self.context['request'].user
         if current_user.is_anonymous:
             return False
         return ShoppingCart.objects.filter(
             recipe=obj, user=current_user).exists()
 
+    def save(self, **kwargs):
+        instance = super().save(**kwargs)
+        image = self.validated_data.get('image')
+        if isinstance(image, TemporaryUploadedFile):
+            image.close()
+        return instance
+
+    def schedule_thumbnails(self, recipe):
+        """Ставит создание миниатюр в фоновый пул после фиксации
+        транзакции; по готовности миниатюры отмечаются у рецептов."""
+        name = recipe.image.name
+
+        def submit():
+            get_executor('images', settings.IMAGE_WORKERS).submit(
+                make_thumbnails, name,
+            ).add_done_callback(partial(on_thumbnails_done, name))
+
+        transaction.on_commit(submit)
+
     def create_recipe_ingredient(self, recipe, ingredients):
         obj = (RecipeIngredient(
             recipe=recipe, ingredient_id=ing['id'], amount=ing['amount']
         ) for ing in ingredients)
-        RecipeIngredient.objects.bulk_create(obj)
+        created = RecipeIngredient.objects.bulk_create(obj)
+        ingredient_recipe_index.add(
+            recipe.pk, [item.ingredient_id for item in created])
+        similar_recipes.mark_changed(recipe.pk)
 
     def create(self, validated_data):
         tags = self.initial_data.get('tags')
@@ -180,18 +304,105 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_recipe_ingredient(recipe, ingredients)
+        self.schedule_thumbnails(recipe)
         return recipe
 
+    def update_recipe_ingredients(self, recipe, ingredients):
+        """Применяет к ингредиентам рецепта только разницу с новым списком:
+        добавляет новые, меняет количество и удаляет лишние. Массовые
+        операции не вызывают сигналы, а пересчёт списков покупок при
+        удалении отложен, поэтому списки покупок и индекс ингредиентов
+        обновляются здесь одним вызовом."""
+        current = {
+            item.ingredient_id: item
+            for item in recipe.recipeingredient_set.all()
+        }
+        amounts = {int(ing['id']): int(ing['amount']) for ing in ingredients}
+        removed = [
+            item for ingredient_id, item in current.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        added = [
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        if removed:
+            with defer_refresh():
+                RecipeIngredient.objects.filter(
+                    pk__in=[item.pk for item in removed]).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+            ingredient_recipe_index.add(
+                recipe.pk, [item.ingredient_id for item in added])
+            similar_recipes.mark_changed(recipe.pk)
+        if removed or changed or added:
+            refresh_shopping_lists(
+                cart_holders(recipe.pk),
+                [item.ingredient_id for item in removed + changed + added]
+            )
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = self.initial_data.pop('ingredients')
-        RecipeIngredient.objects.filter(recipe=instance).all().delete()
-        self.create_recipe_ingredient(instance, ingredients)
+        self.update_recipe_ingredients(instance, ingredients)
         tags = self.initial_data.get('tags')
         instance.tags.set(tags)
-        instance.image = validated_data.get('image', instance.image)
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time)
-        instance.save()
+        update_fields = [
+            field for field, value in validated_data.items()
+            if field == 'image' or getattr(instance, field) != value
+        ]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        if update_fields:
+            instance.save(update_fields=update_fields)
+        if 'image' in update_fields:
+            self.schedule_thumbnails(instance)
         return instance
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для пакетного добавления и удаления."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class IngredientMatchSerializer(serializers.Serializer):
+    """Параметры поиска рецептов по набору ингредиентов."""
+    ingredients = serializers.CharField()
+    min_matches = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_ingredients(self, value):
+        try:
+            ids = {int(pk) for pk in value.split(',') if pk.strip()}
+        except ValueError:
+            raise serializers.ValidationError(
+                'Ожидается список id ингредиентов через запятую.')
+        if not ids:
+            raise serializers.ValidationError('Укажите ингредиенты.')
+        if len(ids) > settings.INGREDIENT_MATCH_MAX_IDS:
+            raise serializers.ValidationError(
+                f'Не больше {settings.INGREDIENT_MATCH_MAX_IDS} ингредиентов.')
+        return ids
+
+
+class SimilarRecipesSerializer(serializers.Serializer):
+    """Параметры запроса похожих рецептов."""
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.SIMILAR_RECIPES_MAX_LIMIT,
+        default=settings.SIMILAR_RECIPES_LIMIT)
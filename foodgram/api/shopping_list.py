@@ -0,0 +1,145 @@
+import csv
+import hashlib
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from recipes.models import ShoppingListItem
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+FONT_NAME = 'FreeSans'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'FreeSans.ttf')
+FILENAME = 'shoppingcart'
+
+
+def register_fonts():
+    """Регистрирует шрифт для PDF. Вызывается один раз при старте."""
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def get_shopping_list_queryset(user):
+    """Ингредиенты из списка покупок пользователя с суммарным количеством."""
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        )
+        .order_by('ingredient__name')
+    )
+
+
+def get_shopping_list(user):
+    return list(get_shopping_list_queryset(user))
+
+
+def _iterate(user):
+    return get_shopping_list_queryset(user).iterator()
+
+
+def stream_txt(user):
+    """Построчно отдаёт список покупок в виде текста."""
+    yield 'Cписок покупок:\n'
+    for index, item in enumerate(_iterate(user), start=1):
+        yield (f'{index}. {item["name"]} - {item["amount"]} '
+               f'{item["measurement_unit"]}.\n')
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer, возвращающий записанную строку."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(user):
+    """Построчно отдаёт список покупок в формате CSV."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for item in _iterate(user):
+        yield writer.writerow((
+            item['name'],
+            item['measurement_unit'],
+            item['amount'],
+        ))
+
+
+def stream_json(user):
+    """Поэлементно отдаёт список покупок в виде JSON-массива."""
+    separator = '['
+    for item in _iterate(user):
+        yield separator + json.dumps({
+            'name': item['name'],
+            'measurement_unit': item['measurement_unit'],
+            'amount': item['amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+STREAMS = {
+    'txt': stream_txt,
+    'csv': stream_csv,
+    'json': stream_json,
+}
+
+
+def get_fingerprint(shopping_list):
+    """Отпечаток содержимого списка покупок, используется как ETag и ключ
+    кеша, поэтому любое изменение корзины или ингредиентов рецептов сразу
+    даёт новый отпечаток."""
+    return hashlib.sha256(
+        json.dumps(shopping_list, ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+def render_pdf(shopping_list):
+    """Рисует список покупок в PDF и возвращает содержимое файла."""
+    buffer = BytesIO()
+    page = canvas.Canvas(buffer, pagesize=letter)
+    x_position, y_position = 50, 800
+    page.setFont(FONT_NAME, 14)
+    if shopping_list:
+        indent = 20
+        page.drawString(x_position, y_position, 'Cписок покупок:')
+        for index, recipe in enumerate(shopping_list, start=1):
+            page.drawString(
+                x_position, y_position - indent,
+                f'{index}. {recipe["name"]} - '
+                f'{recipe["amount"]} '
+                f'{recipe["measurement_unit"]}.'
+            )
+            y_position -= 15
+            if y_position <= 50:
+                page.showPage()
+                page.setFont(FONT_NAME, 14)
+                y_position = 800
+    else:
+        page.setFont(FONT_NAME, 24)
+        page.drawString(
+            x_position,
+            y_position,
+            'Cписок покупок пуст!',
+        )
+    page.save()
+    return buffer.getvalue()
+
+
+def get_cached_pdf(fingerprint):
+    return cache.get(f'shopping-list-pdf:{fingerprint}')
+
+
+def get_pdf(shopping_list, fingerprint):
+    """Возвращает PDF из кеша или рисует и кеширует его."""
+    pdf = get_cached_pdf(fingerprint)
+    if pdf is None:
+        pdf = render_pdf(shopping_list)
+        cache.set(f'shopping-list-pdf:{fingerprint}', pdf,
+                  settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return pdf
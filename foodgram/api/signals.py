@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model, user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_token(request, **kwargs):
+    if isinstance(getattr(request, 'auth', None), Token):
+        token_cache.invalidate(request.auth.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(instance, created, **kwargs):
+    """Сбрасывает токены пользователя при любом изменении, в том числе
+    при деактивации, чтобы в кеше не оставался устаревший объект."""
+    if not created:
+        token_cache.invalidate(*Token.objects.filter(
+            user=instance).values_list('key', flat=True))
@@ -2,7 +2,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (DownloadShoppingCartView, IngredientViewSet, RecipeViewSet,
-                    TagViewSet, UserViewSet)
+                    ShoppingCartJobView, TagViewSet, UserViewSet)
 
 router = DefaultRouter()
 
@@ -14,6 +14,8 @@ router.register('users', UserViewSet)
 urlpatterns = [
     path('recipes/download_shopping_cart/', DownloadShoppingCartView.as_view(),
          name='download_shopping_cart'),
+    path('recipes/download_shopping_cart/<uuid:job_id>/',
+         ShoppingCartJobView.as_view(), name='shopping_cart_job'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken'))
@@ -1,33 +1,63 @@
 from io import BytesIO
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import FileResponse
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Subquery, Value
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
+from recipes.cache import (INGREDIENTS_VERSION, TAGS_VERSION, bump_version,
+                           feed_version_key, get_version)
+from recipes.indexes import ingredient_index, ingredient_recipe_index
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.services import recount_favorites, refresh_shopping_lists
+from recipes.similarity import similar_recipes
 from rest_framework import filters, status, views, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
 from users.models import Subscription
+from users.services import recount_subscribers
 
+from . import bulk, jobs
 from .filters import RecipeFilter
+from .metrics import render_metrics
+from .mixins import CachedListMixin, FieldsetMixin
+from .paginations import (LimitCursorPagination, LimitPageNumberPagination,
+                          UserCursorPagination)
 from .permissions import OwnerOrReadOnly, ReadOnly
-from .serializers import (IngredientSerializer, RecipeListSerializer,
-                          RecipeSerializer, SubscriptionSerializer,
-                          TagSerializer)
+from .renderers import (CSVRenderer, JSONExportRenderer, PDFRenderer,
+                        PlainTextRenderer)
+from .serializers import (BulkIdsSerializer, IngredientMatchSerializer,
+                          IngredientSerializer, RecipeListSerializer,
+                          RecipeSerializer, SimilarRecipesSerializer,
+                          SubscriptionSerializer, TagSerializer,
+                          get_recipes_limit)
+from .shopping_list import (FILENAME, STREAMS, get_cached_pdf, get_fingerprint,
+                            get_pdf, get_shopping_list)
 
 User = get_user_model()
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+def get_bulk_ids(request):
+    """Проверенный список id из тела пакетного запроса."""
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
+
+class IngredientViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
     """Управление ингредиентами."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -35,30 +65,87 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (ReadOnly,)
     filter_backends = (filters.SearchFilter,)
     search_fields = ('^name',)
+    cache_version_key = INGREDIENTS_VERSION
+
+    def get_list_data(self, request, *args, **kwargs):
+        """Поиск по началу названия через индекс в памяти, без обращения
+        к базе данных."""
+        prefix = request.query_params.get(api_settings.SEARCH_PARAM, '')
+        limit = settings.INGREDIENT_SEARCH_LIMIT if prefix else None
+        return ingredient_index.search(prefix, limit)
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(CachedListMixin, viewsets.ModelViewSet):
     """Управление категориями рецептов."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (ReadOnly,)
+    cache_version_key = TAGS_VERSION
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(FieldsetMixin, viewsets.ModelViewSet):
     """Управление рецептами."""
-    queryset = Recipe.objects.prefetch_related(
-        'author', 'tags', 'ingredients').all()
+    queryset = Recipe.objects.defer('search_vector')
     serializer_class = RecipeSerializer
     permission_classes = (OwnerOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        """Рецепты с флагами избранного, корзины и подписки на автора,
+        вычисленными для текущего пользователя в основном запросе.
+        Связанные объекты, флаги и текст рецепта загружаются, только если
+        они попадут в ответ или нужны фильтрам."""
+        queryset = super().get_queryset()
+        if self.wants_field('author'):
+            queryset = queryset.select_related('author')
+        if self.wants_field('tags'):
+            queryset = queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.all()))
+        if self.wants_field('ingredients'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient').order_by('id'),
+            ))
+        if not self.wants_field('text'):
+            queryset = queryset.defer('text')
+        user = self.request.user
+        flags = (
+            ('is_favorited', 'is_favorited', Favorite.objects.filter(
+                recipe=OuterRef('pk'), user=user.pk)),
+            ('is_in_shopping_cart', 'is_in_shopping_cart',
+             ShoppingCart.objects.filter(
+                 recipe=OuterRef('pk'), user=user.pk)),
+            ('author_is_subscribed', 'author', Subscription.objects.filter(
+                author=OuterRef('author'), subscriber=user.pk)),
+        )
+        return queryset.annotate(**{
+            name: Value(False) if user.is_anonymous else Exists(subquery)
+            for name, field, subquery in flags
+            if self.wants_field(field) or name in self.request.query_params
+        })
+
+    def reload(self, serializer):
+        """Загружает сохранённый рецепт заново по плану get_queryset:
+        после изменения ингредиентов и тегов предзагруженные данные
+        устарели, а без них ответ выполнял бы запрос на каждый
+        ингредиент."""
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk)
+
     def perform_create(self, serializer):
         """Создание нового рецепта."""
         serializer.save(author=self.request.user)
+        self.reload(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.reload(serializer)
 
     @action(methods=['post', 'delete'], detail=True)
+    @transaction.atomic
     def favorite(self, request, pk):
         """Добавляет/удаляет рецепт из избранного."""
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -78,6 +165,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
 
     @action(methods=['post', 'delete'], detail=True)
+    @transaction.atomic
     def shopping_cart(self, request, pk):
         """Добавляет/удаляет рецепт из списка покупок."""
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -96,71 +184,238 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_204_NO_CONTENT
             )
 
+    @action(methods=['get'], detail=False,
+            permission_classes=[IsAuthenticated],
+            pagination_class=LimitCursorPagination)
+    def feed(self, request):
+        """Рецепты всех авторов, на которых подписан пользователь.
+        id рецептов первой страницы кешируются для каждого пользователя до
+        новой публикации у авторов или изменения подписок."""
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            author__subscription__subscriber=request.user)
+        paginator = self.paginator
+        cache_key = None
+        if set(request.query_params) <= {paginator.page_size_query_param,
+                                         self.fields_param, self.omit_param}:
+            cache_key = 'feed:{}:{}:{}'.format(
+                request.user.pk,
+                get_version(feed_version_key(request.user.pk)),
+                paginator.get_page_size(request),
+            )
+            state = cache.get(cache_key)
+            if state is not None:
+                page = queryset.filter(pk__in=state['ids']).order_by(
+                    *paginator.ordering)
+                serializer = self.get_serializer(page, many=True)
+                return paginator.get_cached_response(
+                    request, serializer.data, state)
+        page = self.paginate_queryset(queryset)
+        if cache_key is not None:
+            cache.set(cache_key, paginator.get_page_state(page),
+                      settings.FEED_CACHE_TIMEOUT)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=False, url_path='by_ingredients',
+            url_name='by-ingredients',
+            pagination_class=LimitPageNumberPagination)
+    def by_ingredients(self, request):
+        """Рецепты, которые можно приготовить из набора ингредиентов.
+
+        Рецепт подходит, если в нём есть не меньше min_matches ингредиентов
+        из списка (по умолчанию все). Сначала идут рецепты с большим числом
+        совпадений, затем с меньшим числом недостающих ингредиентов.
+        Ранжирование выполняется по индексу в памяти, из базы данных
+        загружается только текущая страница.
+        """
+        params = IngredientMatchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ranked = ingredient_recipe_index.search(
+            params.validated_data['ingredients'],
+            params.validated_data.get('min_matches'),
+        )
+        page = self.paginate_queryset(
+            [recipe_id for recipe_id, _ in ranked])
+        recipes = self.get_queryset().in_bulk(page)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in page if pk in recipes], many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=True)
+    def similar(self, request, pk):
+        """Рецепты, похожие на данный по составу ингредиентов и тегам,
+        в порядке убывания косинусной близости."""
+        recipe = get_object_or_404(Recipe, pk=pk)
+        params = SimilarRecipesSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ranked = similar_recipes.search(
+            recipe.pk, params.validated_data['limit'])
+        recipes = Recipe.objects.defer('search_vector').in_bulk(
+            [recipe_id for recipe_id, _ in ranked])
+        serializer = RecipeListSerializer(
+            [recipes[pk] for pk, _ in ranked if pk in recipes],
+            many=True, context={'request': request})
+        return Response(serializer.data)
+
+    @action(methods=['post', 'delete'], detail=False, url_path='favorite',
+            url_name='favorite-bulk', permission_classes=[IsAuthenticated])
+    @transaction.atomic
+    def favorite_bulk(self, request):
+        """Добавляет/удаляет из избранного несколько рецептов сразу."""
+        ids = get_bulk_ids(request)
+        if request.method == 'DELETE':
+            return Response(bulk.bulk_remove(
+                Favorite, 'user', request.user, 'recipe', ids))
+        created, results = bulk.bulk_add(
+            Favorite, 'user', request.user, 'recipe', ids,
+            bulk.lock_ids(Recipe.objects.filter(pk__in=ids)),
+        )
+        if created:
+            recount_favorites(created)
+        return Response(results)
+
+    @action(methods=['post', 'delete'], detail=False, url_path='shopping_cart',
+            url_name='shopping-cart-bulk',
+            permission_classes=[IsAuthenticated])
+    @transaction.atomic
+    def shopping_cart_bulk(self, request):
+        """Добавляет/удаляет из списка покупок несколько рецептов сразу."""
+        ids = get_bulk_ids(request)
+        if request.method == 'DELETE':
+            return Response(bulk.bulk_remove(
+                ShoppingCart, 'user', request.user, 'recipe', ids))
+        created, results = bulk.bulk_add(
+            ShoppingCart, 'user', request.user, 'recipe', ids,
+            bulk.lock_ids(Recipe.objects.filter(pk__in=ids)),
+        )
+        if created:
+            refresh_shopping_lists(
+                [request.user.pk],
+                RecipeIngredient.objects.filter(
+                    recipe__in=created).values('ingredient'),
+            )
+        return Response(results)
+
 
 class DownloadShoppingCartView(views.APIView):
-    """Скачивание списка покупок в виде PDF файла."""
+    """Скачивание списка покупок в виде PDF, текстового, CSV или JSON файла.
+    Формат выбирается параметром format или заголовком Accept."""
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (PDFRenderer, PlainTextRenderer, CSVRenderer,
+                        JSONExportRenderer)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Служебные ответы (ошибки, статус задания) всегда отдаются в JSON,
+        рендереры выгрузки используются только для выбора формата."""
+        if isinstance(response, Response):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
 
     def get(self, request):
-        """Обработчик GET-запроса для создания и возврата списка покупок в виде
-        PDF файла."""
-        buffer = BytesIO()
-        page = canvas.Canvas(buffer, pagesize=letter)
-        pdfmetrics.registerFont(TTFont('FreeSans', 'FreeSans.ttf'))
-        x_position, y_position = 50, 800
-        shopping_cart = (
-            Recipe.objects.filter(shopping_cart__user=request.user)
-            .values(
-                'ingredients__name',
-                'ingredients__measurement_unit'
+        """Обработчик GET-запроса для создания и возврата списка покупок.
+        Текстовые форматы отдаются потоком по мере чтения из базы.
+        Повторная загрузка неизменившегося PDF отдаётся из кеша или ответом
+        304 по ETag. С параметром async PDF рисуется в фоновом процессе,
+        а в ответе возвращается id задания."""
+        renderer = request.accepted_renderer
+        if renderer.format in STREAMS:
+            response = StreamingHttpResponse(
+                STREAMS[renderer.format](request.user),
+                content_type=f'{renderer.media_type}; '
+                             f'charset={renderer.charset}',
             )
-            .annotate(amount=Sum('recipeingredient__amount'))
-            .order_by()
-        )
-        page.setFont('FreeSans', 14)
-        if shopping_cart:
-            indent = 20
-            page.drawString(x_position, y_position, 'Cписок покупок:')
-            for index, recipe in enumerate(shopping_cart, start=1):
-                page.drawString(
-                    x_position, y_position - indent,
-                    f'{index}. {recipe["ingredients__name"]} - '
-                    f'{recipe["amount"]} '
-                    f'{recipe["ingredients__measurement_unit"]}.'
-                )
-                y_position -= 15
-                if y_position <= 50:
-                    page.showPage()
-                    y_position = 800
-            page.save()
-            buffer.seek(0)
-            response = FileResponse(
-                buffer, content_type='application/pdf')
             response['Content-Disposition'] = (
-                'attachment; filename="shoppingcart.pdf"')
+                f'attachment; filename="{FILENAME}.{renderer.format}"')
             return response
-        page.setFont('FreeSans', 24)
-        page.drawString(
-            x_position,
-            y_position,
-            'Cписок покупок пуст!',
-        )
-        page.save()
-        buffer.seek(0)
-        response = FileResponse(
-            buffer, content_type='application/pdf')
-        response['Content-Disposition'] = (
-            'attachment; filename="shoppingcart.pdf"')
+        shopping_list = get_shopping_list(request.user)
+        fingerprint = get_fingerprint(shopping_list)
+        if request.query_params.get('async'):
+            job_id = jobs.enqueue(
+                request.user, shopping_list, get_cached_pdf(fingerprint))
+            return Response(
+                {
+                    'job_id': job_id,
+                    'status': jobs.get_status(job_id, request.user),
+                    'url': reverse(
+                        'shopping_cart_job', args=(job_id,), request=request),
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
+        etag = quote_etag(fingerprint)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = FileResponse(
+                BytesIO(get_pdf(shopping_list, fingerprint)),
+                as_attachment=True,
+                filename=f'{FILENAME}.pdf',
+                content_type=PDFRenderer.media_type,
+            )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
         return response
 
 
-class UserViewSet(DjoserUserViewSet):
+class ShoppingCartJobView(views.APIView):
+    """Статус и результат фоновой отрисовки списка покупок."""
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, job_id):
+        job_status = jobs.get_status(str(job_id), request.user)
+        if job_status is None:
+            raise Http404
+        if job_status != jobs.DONE:
+            return Response(
+                {'job_id': str(job_id), 'status': job_status},
+                status=(status.HTTP_500_INTERNAL_SERVER_ERROR
+                        if job_status == jobs.FAILED
+                        else status.HTTP_202_ACCEPTED)
+            )
+        return FileResponse(
+            open(jobs.get_result_path(str(job_id)), 'rb'),
+            as_attachment=True,
+            filename=f'{FILENAME}.pdf',
+            content_type=PDFRenderer.media_type,
+        )
+
+
+class UserViewSet(FieldsetMixin, DjoserUserViewSet):
     """Управление пользователями."""
     serializer_class = SubscriptionSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = (UserCursorPagination if settings.CURSOR_PAGINATION
+                        else PageNumberPagination)
+
+    def get_recipes_prefetch(self):
+        """Последние recipes_limit рецептов каждого автора одним запросом."""
+        recipes = Recipe.objects.defer('search_vector', 'text')
+        limit = get_recipes_limit(self.request)
+        if limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(author=OuterRef('author'))
+                .values('pk')[:limit]
+            ))
+        return Prefetch('recipes', queryset=recipes, to_attr='page_recipes')
+
+    def get_queryset(self):
+        """Флаг подписки и рецепты авторов загружаются для всей страницы
+        сразу и только если попадут в ответ."""
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        user = self.request.user
+        if self.wants_field('is_subscribed'):
+            queryset = queryset.annotate(
+                is_subscribed=Value(False) if user.is_anonymous
+                else Exists(Subscription.objects.filter(
+                    author=OuterRef('pk'), subscriber=user.pk))
+            )
+        if self.wants_field('recipes'):
+            queryset = queryset.prefetch_related(self.get_recipes_prefetch())
+        return queryset
 
     @action(methods=['post'], detail=True,
             permission_classes=[IsAuthenticated])
+    @transaction.atomic
     def subscribe(self, request, id):
         """Подписать на автора рецепта."""
         author = get_object_or_404(User, pk=id)
@@ -171,6 +426,7 @@ class UserViewSet(DjoserUserViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
+    @transaction.atomic
     def delete_subscribe(self, request, id):
         """Отписывает от автора рецепта."""
         author = get_object_or_404(User, pk=id)
@@ -180,16 +436,54 @@ class UserViewSet(DjoserUserViewSet):
         return Response({"success": "Вы успешно отписаны."},
                         status=status.HTTP_204_NO_CONTENT)
 
+    @action(methods=['post', 'delete'], detail=False, url_path='subscribe',
+            url_name='subscribe-bulk', permission_classes=[IsAuthenticated])
+    @transaction.atomic
+    def subscribe_bulk(self, request):
+        """Подписывает на нескольких авторов сразу или отписывает от них."""
+        ids = get_bulk_ids(request)
+        if request.method == 'DELETE':
+            return Response(bulk.bulk_remove(
+                Subscription, 'subscriber', request.user, 'author', ids))
+        created, results = bulk.bulk_add(
+            Subscription, 'subscriber', request.user, 'author', ids,
+            bulk.lock_ids(
+                User.objects.filter(pk__in=ids).exclude(pk=request.user.pk)),
+            forbidden=[request.user.pk],
+        )
+        if created:
+            recount_subscribers(created)
+            key = feed_version_key(request.user.pk)
+            transaction.on_commit(lambda: bump_version(key))
+        return Response(results)
+
     @action(methods=['get'], detail=False,
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        """Список авторов, на которых подписан пользователь."""
-        authors = User.objects.filter(subscription__subscriber=request.user)
+        """Список авторов, на которых подписан пользователь.
+        Последние recipes_limit рецептов всех авторов страницы загружаются
+        одним запросом."""
+        authors = (
+            User.objects.filter(subscription__subscriber=request.user)
+            .annotate(is_subscribed=Value(True))
+            .order_by('id')
+        )
+        if self.wants_field('recipes'):
+            authors = authors.prefetch_related(self.get_recipes_prefetch())
         page = self.paginate_queryset(authors)
         if page is not None:
-            serializer = self.get_serializer(
-                page, many=True, context={'request': request})
+            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(
-            authors, many=True, context={'request': request})
+        serializer = self.get_serializer(authors, many=True)
         return Response(serializer.data)
+
+
+def metrics(request):
+    """Гистограммы MetricsMiddleware в текстовом формате Prometheus.
+    Маршрут не проксируется nginx и доступен только внутри сети."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(
+        render_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
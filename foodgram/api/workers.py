@@ -0,0 +1,11 @@
+from concurrent.futures import ProcessPoolExecutor
+
+_executors = {}
+
+
+def get_executor(name, max_workers):
+    """Пул процессов для фоновых задач, создаётся при первом обращении
+    отдельно для каждого процесса веб-сервера."""
+    if name not in _executors:
+        _executors[name] = ProcessPoolExecutor(max_workers=max_workers)
+    return _executors[name]
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,6 +86,15 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -119,17 +129,41 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
 
+CURSOR_PAGINATION = os.getenv('CURSOR_PAGINATION', 'False') == 'True'
+
+CURSOR_PAGINATION_COUNT = os.getenv(
+    'CURSOR_PAGINATION_COUNT', 'False') == 'True'
+
+CURSOR_PAGINATION_COUNT_TIMEOUT = int(
+    os.getenv('CURSOR_PAGINATION_COUNT_TIMEOUT', 60))
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10_000))
+
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 60))
+
+AUTH_TOKEN_SHARED_CACHE = os.getenv('AUTH_TOKEN_SHARED_CACHE', 'default')
+
+FAST_JSON_RENDERER = os.getenv('FAST_JSON_RENDERER', 'True') == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer' if FAST_JSON_RENDERER
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'api.paginations.LimitPageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': (
+        'api.paginations.LimitCursorPagination' if CURSOR_PAGINATION
+        else 'api.paginations.LimitPageNumberPagination'
+    ),
     'PAGE_SIZE': 6,
     'SEARCH_PARAM': 'name'
 }
@@ -148,3 +182,97 @@ DJOSER = {
 }
 
 MAX_LENGHT = int(256)
+
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 1))
+
+IMAGE_RELEASE_MIN_AGE = int(os.getenv('IMAGE_RELEASE_MIN_AGE', 60 * 60))
+
+THUMBNAIL_SIZES = {
+    'list': (480, 480),
+    'detail': (1200, 1200),
+}
+
+THUMBNAIL_FORMAT = os.getenv('THUMBNAIL_FORMAT', 'webp')
+
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
+
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24))
+
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', 60))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+
+RECIPE_INDEX_JOURNAL_SIZE = int(os.getenv('RECIPE_INDEX_JOURNAL_SIZE', 1000))
+
+RECIPE_INDEX_JOURNAL_TIMEOUT = int(
+    os.getenv('RECIPE_INDEX_JOURNAL_TIMEOUT', 60 * 60 * 24))
+
+INGREDIENT_MATCH_MAX_IDS = int(os.getenv('INGREDIENT_MATCH_MAX_IDS', 50))
+
+SIMILAR_RECIPES_DIR = os.getenv(
+    'SIMILAR_RECIPES_DIR', os.path.join(BASE_DIR, 'similar_recipes'))
+
+SIMILAR_RECIPES_TAG_WEIGHT = float(
+    os.getenv('SIMILAR_RECIPES_TAG_WEIGHT', 0.5))
+
+SIMILAR_RECIPES_LIMIT = int(os.getenv('SIMILAR_RECIPES_LIMIT', 10))
+
+SIMILAR_RECIPES_MAX_LIMIT = int(os.getenv('SIMILAR_RECIPES_MAX_LIMIT', 50))
+
+SIMILAR_RECIPES_MAX_PENDING = int(
+    os.getenv('SIMILAR_RECIPES_MAX_PENDING', 5000))
+
+SIMILAR_RECIPES_JOURNAL_TIMEOUT = int(
+    os.getenv('SIMILAR_RECIPES_JOURNAL_TIMEOUT', 60 * 60 * 24 * 7))
+
+SHOPPING_LIST_CACHE_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_CACHE_TIMEOUT', 60 * 60))
+
+SHOPPING_LIST_WORKERS = int(os.getenv('SHOPPING_LIST_WORKERS', 2))
+
+SHOPPING_LIST_JOBS_DIR = os.getenv(
+    'SHOPPING_LIST_JOBS_DIR', os.path.join(BASE_DIR, 'shopping_list_jobs'))
+
+SHOPPING_LIST_JOB_TTL = int(os.getenv('SHOPPING_LIST_JOB_TTL', 60 * 60))
+
+SHOPPING_LIST_JOB_RETRY_AFTER = int(
+    os.getenv('SHOPPING_LIST_JOB_RETRY_AFTER', 30))
+
+SHOPPING_LIST_JOB_TIMEOUT = int(os.getenv('SHOPPING_LIST_JOB_TIMEOUT', 60 * 5))
+
+FEED_CACHE_TIMEOUT = int(os.getenv('FEED_CACHE_TIMEOUT', 60 * 5))
+
+BULK_MAX_IDS = int(os.getenv('BULK_MAX_IDS', 500))
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+
+SLOW_REQUEST_THRESHOLD = int(os.getenv('SLOW_REQUEST_THRESHOLD', 0))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'default': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'default',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': os.getenv('LOG_LEVEL', 'INFO'),
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['console'],
+            'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -1,3 +1,4 @@
+from api.views import metrics
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
@@ -6,6 +7,7 @@ from django.urls import include, path
 urlpatterns = [
     path('api/', include('api.urls')),
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
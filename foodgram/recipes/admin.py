@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, Tag)
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -10,21 +10,43 @@ class RecipeIngredientInline(admin.TabularInline):
     extra = 1
 
 
+class CounterListFilter(admin.SimpleListFilter):
+    """Фильтр по диапазонам денормализованного счётчика."""
+    ranges = (
+        ('0', 'Нет', 0, 0),
+        ('1-9', 'От 1 до 9', 1, 9),
+        ('10-99', 'От 10 до 99', 10, 99),
+        ('100+', '100 и больше', 100, None),
+    )
+
+    def lookups(self, request, model_admin):
+        return [(value, label) for value, label, _, _ in self.ranges]
+
+    def queryset(self, request, queryset):
+        for value, _, low, high in self.ranges:
+            if self.value() == value:
+                queryset = queryset.filter(
+                    **{f'{self.parameter_name}__gte': low})
+                if high is not None:
+                    queryset = queryset.filter(
+                        **{f'{self.parameter_name}__lte': high})
+        return queryset
+
+
+class FavoritesCountFilter(CounterListFilter):
+    title = 'добавления в избранное'
+    parameter_name = 'favorites_count'
+
+
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'added_to_favorites')
-    list_filter = ('tags', 'name', 'author')
+    list_display = ('name', 'author', 'favorites_count')
+    list_filter = ('tags', 'name', 'author', FavoritesCountFilter)
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username', 'tags__slug', 'tags__name')
     filter_horizontal = ('tags',)
     inlines = (RecipeIngredientInline,)
 
-    @admin.display(description='Добавления в избранное')
-    def added_to_favorites(self, obj: Recipe):
-        """Вычисляемое поле для админ панели.
-        Вовзращает количество добавлений рецепта в Избранное.
-        """
-        return obj.favorites.count()
-
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -56,3 +78,10 @@ class FavoriteAdmin(admin.ModelAdmin):
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('id', 'recipe', 'user')
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    list_select_related = ('user', 'ingredient')
+    search_fields = ('user__username', 'ingredient__name')
@@ -0,0 +1,71 @@
+import uuid
+
+from django.core.cache import cache
+
+INGREDIENTS_VERSION = 'version:ingredients'
+TAGS_VERSION = 'version:tags'
+RECIPE_INDEX_VERSION = 'version:recipe-index'
+
+
+def feed_version_key(user_id):
+    """Ключ версии ленты подписок пользователя."""
+    return f'version:feed:{user_id}'
+
+
+def get_version(key):
+    """Текущая версия данных, используется в ключах кеша.
+
+    Версия хранится в кеше default. С общим бэкендом (Redis, см.
+    CACHE_BACKEND) её сброс в одном процессе виден всем остальным,
+    с LocMemCache — только в этом процессе.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Делает устаревшими все данные, закешированные с этой версией."""
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+def bump_versions(keys):
+    """Сбрасывает несколько версий одним обращением к кешу."""
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+
+class ChangeJournal:
+    """Журнал изменений в кеше default (между процессами — только
+    с общим бэкендом, см. get_version).
+
+    Записи получают последовательные номера, каждый процесс сам помнит
+    номер последней применённой записи. Записи живут timeout секунд.
+    """
+    def __init__(self, name, timeout):
+        self.name = name
+        self.timeout = timeout
+        self.sequence_key = f'{name}:sequence'
+
+    def _key(self, number):
+        return f'{self.name}:change:{number}'
+
+    def sequence(self):
+        """Номер последней записи."""
+        cache.add(self.sequence_key, 0, None)
+        return cache.get(self.sequence_key) or 0
+
+    def record(self, change):
+        cache.add(self.sequence_key, 0, None)
+        number = cache.incr(self.sequence_key)
+        cache.set(self._key(number), change, self.timeout)
+
+    def read(self, start, end):
+        """Записи с номерами от start до end включительно. Потерянные
+        записи пропускаются, второе значение — их число."""
+        numbers = range(start, end + 1)
+        changes = cache.get_many([self._key(number) for number in numbers])
+        found = [changes[self._key(number)] for number in numbers
+                 if self._key(number) in changes]
+        return found, len(numbers) - len(found)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии кеша и журналы изменений доходят до других процессов
+    (воркеров, пула заданий, команд manage.py) только через общий кеш."""
+    if settings.CACHES['default']['BACKEND'] not in LOCAL_CACHES:
+        return []
+    return [Warning(
+        'Кеш default хранится в памяти процесса: сброс версий каталога, '
+        'ленты и индексов не виден другим процессам.',
+        hint='Задайте CACHE_BACKEND и CACHE_LOCATION общего кеша, '
+             'например django.core.cache.backends.redis.RedisCache.',
+        id='recipes.W001',
+    )]
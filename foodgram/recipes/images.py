@@ -0,0 +1,91 @@
+import os
+import time
+
+from django.conf import settings
+from django.db import connection
+from PIL import Image
+
+from .storage import image_storage
+
+THUMBNAIL_DIR = 'thumbnails'
+
+
+def thumbnail_name(name, size):
+    """Имя миниатюры размера size для файла изображения name."""
+    base = os.path.basename(name)
+    return f'{THUMBNAIL_DIR}/{size}/{base}.{settings.THUMBNAIL_FORMAT}'
+
+
+def thumbnail_url(image, size, ready):
+    """Ссылка на миниатюру или на оригинал, пока миниатюры не готовы.
+
+    ready — имя изображения, для которого миниатюры уже созданы
+    (Recipe.thumbnails_image), поэтому хранилище не проверяется.
+    """
+    if not image:
+        return None
+    if ready != image.name:
+        return image.url
+    return image_storage.url(thumbnail_name(image.name, size))
+
+
+def mark_thumbnails_ready(name):
+    """Отмечает миниатюры изображения name готовыми у всех рецептов с ним."""
+    from .models import Recipe
+
+    Recipe.objects.filter(image=name).update(thumbnails_image=name)
+
+
+def on_thumbnails_done(name, future):
+    """Колбэк задания make_thumbnails. Выполняется в служебном потоке пула
+    процесса веб-сервера, а не в процессе пула, который не может
+    пользоваться унаследованным соединением с базой данных."""
+    if future.exception() is not None:
+        return
+    try:
+        mark_thumbnails_ready(name)
+    finally:
+        connection.close()
+
+
+def release_image(name):
+    """Удаляет файл изображения и его миниатюры, если на него больше
+    не ссылается ни один рецепт. Файлы, загруженные или использованные
+    повторно меньше IMAGE_RELEASE_MIN_AGE секунд назад, остаются: ссылка
+    на них может быть в незакоммиченной транзакции. Такие файлы удаляет
+    gc_images."""
+    from .models import Recipe
+
+    if not name or Recipe.objects.filter(image=name).exists():
+        return
+    try:
+        modified = os.path.getmtime(image_storage.path(name))
+    except FileNotFoundError:
+        return
+    if time.time() - modified < settings.IMAGE_RELEASE_MIN_AGE:
+        return
+    for size in settings.THUMBNAIL_SIZES:
+        image_storage.delete(thumbnail_name(name, size))
+    image_storage.delete(name)
+
+
+def make_thumbnails(name):
+    """Создаёт миниатюры всех размеров THUMBNAIL_SIZES.
+
+    Выполняется в фоновом процессе, поэтому работает с файлами напрямую.
+    """
+    with Image.open(image_storage.path(name)) as original:
+        original.load()
+        for size, dimensions in settings.THUMBNAIL_SIZES.items():
+            image = original.copy()
+            image.thumbnail(dimensions)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            if settings.THUMBNAIL_FORMAT == 'jpeg':
+                image = image.convert('RGB')
+            path = image_storage.path(thumbnail_name(name, size))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            image.save(tmp_path, format=settings.THUMBNAIL_FORMAT,
+                       quality=settings.THUMBNAIL_QUALITY)
+            os.replace(tmp_path, path)
@@ -0,0 +1,212 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from threading import Lock
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import (INGREDIENTS_VERSION, RECIPE_INDEX_VERSION, ChangeJournal,
+                    bump_version, get_version)
+from .models import Ingredient, RecipeIngredient
+
+# Версия ещё не построенного индекса. Не None: без общего кеша
+# (DummyCache) get_version возвращает None, и индекс не строился бы.
+_UNBUILT = object()
+
+
+class IngredientPrefixIndex:
+    """Отсортированный массив ингредиентов для поиска по началу названия.
+
+    Индекс строится в памяти процесса при первом обращении. Версия индекса
+    хранится в кеше, поэтому с общим бэкендом кеша сброс в одном процессе
+    (сигналами или загрузкой ингредиентов) приводит к перестроению
+    и в остальных.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._version = _UNBUILT
+        self._index = ([], [])
+
+    def _build(self, version):
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].casefold(), row['id'])
+        )
+        self._index = ([row['name'].casefold() for row in rows], rows)
+        self._version = version
+
+    def _ensure_built(self):
+        version = get_version(INGREDIENTS_VERSION)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+
+    def invalidate(self):
+        """Сбрасывает индекс во всех процессах."""
+        bump_version(INGREDIENTS_VERSION)
+
+    def search(self, prefix='', limit=None):
+        """Ингредиенты, название которых начинается с prefix без учёта
+        регистра, в алфавитном порядке."""
+        self._ensure_built()
+        keys, rows = self._index
+        if not prefix:
+            return rows[:limit]
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + '\U0010ffff', lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return rows[start:end]
+
+
+ingredient_index = IngredientPrefixIndex()
+
+
+class IngredientRecipeIndex:
+    """Инвертированный индекс: ингредиент → отсортированный массив id
+    рецептов, в которых он встречается.
+
+    Индекс строится в памяти процесса при первом обращении. Изменения
+    состава рецептов записываются в журнал в кеше и применяются каждым
+    процессом при следующем поиске (другими процессами — если бэкенд
+    кеша общий). Если часть журнала потеряна или он слишком длинный,
+    индекс строится заново.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._journal = ChangeJournal(
+            'recipe-index', settings.RECIPE_INDEX_JOURNAL_TIMEOUT)
+        self._version = _UNBUILT
+        self._applied = 0
+        self._postings = {}
+        self._sizes = {}
+
+    def _build(self, version):
+        sequence = self._journal.sequence()
+        postings, sizes = {}, Counter()
+        rows = (
+            RecipeIngredient.objects
+            .order_by('ingredient_id', 'recipe_id')
+            .values_list('ingredient_id', 'recipe_id')
+            .iterator(chunk_size=10000)
+        )
+        for ingredient_id, recipe_id in rows:
+            recipes = postings.get(ingredient_id)
+            if recipes is None:
+                recipes = postings[ingredient_id] = array('q')
+            recipes.append(recipe_id)
+            sizes[recipe_id] += 1
+        self._postings, self._sizes = postings, dict(sizes)
+        self._version, self._applied = version, sequence
+
+    def _apply(self, add, recipe_id, ingredient_ids):
+        """Применяет изменение; повторное применение ничего не меняет."""
+        for ingredient_id in ingredient_ids:
+            recipes = self._postings.setdefault(ingredient_id, array('q'))
+            position = bisect_left(recipes, recipe_id)
+            present = (position < len(recipes)
+                       and recipes[position] == recipe_id)
+            if add and not present:
+                insort(recipes, recipe_id)
+                self._sizes[recipe_id] = self._sizes.get(recipe_id, 0) + 1
+            elif not add and present:
+                del recipes[position]
+                self._sizes[recipe_id] -= 1
+                if not self._sizes[recipe_id]:
+                    del self._sizes[recipe_id]
+
+    def _sync(self):
+        version = get_version(RECIPE_INDEX_VERSION)
+        if version != self._version:
+            self._build(version)
+            return
+        sequence = self._journal.sequence()
+        if sequence <= self._applied:
+            return
+        if sequence - self._applied > settings.RECIPE_INDEX_JOURNAL_SIZE:
+            self._build(version)
+            return
+        changes, lost = self._journal.read(self._applied + 1, sequence)
+        if lost:
+            self._build(version)
+            return
+        for change in changes:
+            self._apply(*change)
+        self._applied = sequence
+
+    def _record(self, add, recipe_id, ingredient_ids):
+        self._journal.record((add, recipe_id, tuple(ingredient_ids)))
+
+    def add(self, recipe_id, ingredient_ids):
+        """После коммита добавляет рецепт в списки ингредиентов."""
+        ingredient_ids = list(ingredient_ids)
+        transaction.on_commit(
+            lambda: self._record(True, recipe_id, ingredient_ids))
+
+    def remove(self, recipe_id, ingredient_ids):
+        """После коммита убирает рецепт из списков ингредиентов."""
+        ingredient_ids = list(ingredient_ids)
+        transaction.on_commit(
+            lambda: self._record(False, recipe_id, ingredient_ids))
+
+    def invalidate(self):
+        """Перестраивает индекс во всех процессах."""
+        bump_version(RECIPE_INDEX_VERSION)
+
+    def search(self, ingredient_ids, min_matches=None):
+        """Рецепты, содержащие не меньше min_matches ингредиентов из
+        ingredient_ids (по умолчанию все). Возвращает пары (id рецепта,
+        число совпадений): сначала больше совпадений, затем меньше
+        недостающих ингредиентов, затем новее."""
+        ingredient_ids = set(ingredient_ids)
+        if min_matches is None:
+            min_matches = len(ingredient_ids)
+        min_matches = max(1, min(min_matches, len(ingredient_ids)))
+        with self._lock:
+            self._sync()
+            postings = sorted(
+                (self._postings.get(pk, array('q')) for pk in ingredient_ids),
+                key=len,
+            )
+            if min_matches == len(postings):
+                matches = dict.fromkeys(
+                    self._intersect(postings), min_matches)
+            else:
+                matches = Counter()
+                for recipes in postings:
+                    matches.update(recipes)
+            ranked = [
+                (recipe_id, count) for recipe_id, count in matches.items()
+                if count >= min_matches
+            ]
+            sizes = self._sizes
+            ranked.sort(key=lambda item: (
+                -item[1], sizes.get(item[0], 0) - item[1], -item[0]))
+        return ranked
+
+    @staticmethod
+    def _intersect(postings):
+        """Пересечение отсортированных массивов, начиная с самого короткого.
+        Проверка вхождения в остальные массивы — бинарным поиском."""
+        if not postings:
+            return []
+        result = postings[0]
+        for recipes in postings[1:]:
+            found = []
+            start = 0
+            for recipe_id in result:
+                start = bisect_left(recipes, recipe_id, start)
+                if start == len(recipes):
+                    break
+                if recipes[start] == recipe_id:
+                    found.append(recipe_id)
+            result = found
+            if not result:
+                break
+        return result
+
+
+ingredient_recipe_index = IngredientRecipeIndex()
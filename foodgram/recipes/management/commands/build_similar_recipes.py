@@ -0,0 +1,21 @@
+import time
+
+from django.core.management import BaseCommand
+from recipes.similarity import similar_recipes
+
+
+class Command(BaseCommand):
+    help = ('Строит матрицу векторов рецептов для поиска похожих. '
+            'Рецепты, изменённые после построения, учитываются до '
+            'следующего запуска по журналу изменений.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        matrix, meta = similar_recipes.build()
+        size = sum(array.nbytes for array in matrix.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Матрица построена: {len(matrix["recipe_ids"])} рецептов, '
+            f'{len(matrix["features"])} признаков, '
+            f'{len(matrix["values"])} ненулевых значений '
+            f'({size / 2 ** 20:.1f} МБ) за '
+            f'{time.perf_counter() - start:.2f} с.'))
@@ -0,0 +1,46 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from recipes.images import THUMBNAIL_DIR, thumbnail_name
+from recipes.models import Recipe
+from recipes.storage import image_storage
+
+
+class Command(BaseCommand):
+    help = ('Удаляет изображения рецептов и миниатюры, на которые '
+            'не ссылается ни один рецепт.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=settings.IMAGE_RELEASE_MIN_AGE,
+            help='Не трогать файлы моложе указанного числа секунд.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, какие файлы будут удалены.')
+
+    def handle(self, *args, **options):
+        referenced = set()
+        for name in Recipe.objects.values_list('image', flat=True).iterator():
+            referenced.add(name)
+            for size in settings.THUMBNAIL_SIZES:
+                referenced.add(thumbnail_name(name, size))
+        expired = time.time() - options['min_age']
+        removed = 0
+        for directory in ('images', THUMBNAIL_DIR):
+            root = image_storage.path(directory)
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, image_storage.location)
+                    if (name.replace(os.sep, '/') in referenced
+                            or os.path.getmtime(path) > expired):
+                        continue
+                    removed += 1
+                    if options['dry_run']:
+                        self.stdout.write(name)
+                    else:
+                        os.remove(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Неиспользуемых файлов: {removed}'))
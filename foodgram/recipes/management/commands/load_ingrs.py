@@ -1,19 +1,142 @@
 import csv
+import io
+import json
+import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.indexes import ingredient_index
 from recipes.models import Ingredient
 
+FIELDS = ('name', 'measurement_unit')
+
+
+def iter_csv(file):
+    yield from csv.DictReader(file)
+
+
+def iter_json(file, chunk_size=1 << 16):
+    """Потоково читает объекты из JSON-массива или JSON Lines, не загружая
+    файл в память целиком."""
+    decoder = json.JSONDecoder()
+    buffer, position = '', 0
+    while True:
+        while position < len(buffer) and buffer[position] in '[], \t\r\n':
+            position += 1
+        if position == len(buffer):
+            buffer, position = file.read(chunk_size), 0
+            if not buffer:
+                return
+            continue
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+
+
+READERS = {'csv': iter_csv, 'json': iter_json, 'jsonl': iter_json}
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
 
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        data_path = settings.BASE_DIR
-        with open(
-            f'{data_path}/data/ingredients.csv',
-            'r',
-            encoding='utf-8'
-        ) as file:
-            reader = csv.DictReader(file)
+    help = ('Загружает ингредиенты из CSV или JSON. Существующие пары '
+            '(name, measurement_unit) пропускаются, поэтому команду можно '
+            'запускать повторно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'))
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже в PostgreSQL.')
+
+    def handle(self, *args, **options):
+        file_format = (options['format']
+                       or os.path.splitext(options['path'])[1][1:].lower())
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        use_copy = (connection.vendor == 'postgresql'
+                    and not options['no_copy'])
+        start = time.perf_counter()
+        self.read = self.skipped = 0
+        with open(options['path'], 'r', encoding='utf-8') as file:
+            rows = self.clean(READERS[file_format](file))
+            with transaction.atomic():
+                if use_copy:
+                    created = self.copy(rows, options['batch_size'])
+                else:
+                    created = self.bulk_insert(rows, options['batch_size'])
+        elapsed = time.perf_counter() - start
+        if created:
+            ingredient_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты загружены! Прочитано {self.read}, добавлено '
+            f'{created}, пропущено некорректных {self.skipped} за '
+            f'{elapsed:.2f} с ({self.read / (elapsed or 1):.0f} строк/с).'
+        ))
+
+    def clean(self, rows):
+        """Пары (name, measurement_unit) без пробелов по краям; строки
+        с пустыми или слишком длинными значениями пропускаются."""
+        for row in rows:
+            self.read += 1
+            try:
+                values = tuple(str(row[field]).strip() for field in FIELDS)
+            except (KeyError, TypeError):
+                self.skipped += 1
+                continue
+            if all(0 < len(value) <= settings.MAX_LENGHT
+                   for value in values):
+                yield values
+            else:
+                self.skipped += 1
+
+    def bulk_insert(self, rows, batch_size):
+        before = Ingredient.objects.count()
+        for batch in batches(rows, batch_size):
             Ingredient.objects.bulk_create(
-                Ingredient(**data) for data in reader)
-        self.stdout.write(self.style.SUCCESS('Ингредиенты загружены!'))
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch),
+                ignore_conflicts=True,
+            )
+        return Ingredient.objects.count() - before
+
+    def copy(self, rows, batch_size):
+        """Загружает строки через COPY во временную таблицу и переносит
+        новые пары одним INSERT ... ON CONFLICT DO NOTHING."""
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_staging '
+                '(name text, measurement_unit text) ON COMMIT DROP')
+            for batch in batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_staging (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)', buffer)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_staging '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING')
+            return cursor.rowcount
@@ -1,4 +1,5 @@
 from django.core.management import BaseCommand
+from recipes.cache import TAGS_VERSION, bump_version
 from recipes.models import Tag
 
 
@@ -10,4 +11,5 @@ class Command(BaseCommand):
             {'name': 'Завтрак', 'color': '#E26C2D', 'slug': 'breakfast'},
         ]
         Tag.objects.bulk_create(Tag(**tag) for tag in data)
+        bump_version(TAGS_VERSION)
         self.stdout.write(self.style.SUCCESS('Тэги загружены!'))
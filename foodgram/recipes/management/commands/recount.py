@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from recipes.models import Favorite, Recipe
+from users.models import Subscription
+from users.services import count_of
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Сверяет и исправляет денормализованные счётчики.'
+
+    COUNTERS = (
+        (Recipe, 'favorites_count', Favorite.objects.all(), 'recipe'),
+        (User, 'recipes_count', Recipe.objects.all(), 'author'),
+        (User, 'subscribers_count', Subscription.objects.all(), 'author'),
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        for model, counter, queryset, field in self.COUNTERS:
+            actual = count_of(queryset, field)
+            fixed = (
+                model.objects.annotate(actual=actual)
+                .exclude(**{counter: F('actual')})
+                .update(**{counter: actual})
+            )
+            self.stdout.write(
+                f'{model._meta.label}.{counter}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены!'))
@@ -0,0 +1,232 @@
+import csv
+import math
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand, call_command
+from django.utils import timezone
+from PIL import Image
+from recipes.cache import TAGS_VERSION, bump_version
+from recipes.indexes import ingredient_index, ingredient_recipe_index
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.services import refresh_shopping_lists
+from recipes.storage import image_storage
+from users.models import Subscription
+
+User = get_user_model()
+
+PASSWORD = 'seed-password'
+TAGS = (
+    {'name': 'Ужин', 'color': '#8775D2', 'slug': 'supper'},
+    {'name': 'Обед', 'color': '#49B64E', 'slug': 'dinner'},
+    {'name': 'Завтрак', 'color': '#E26C2D', 'slug': 'breakfast'},
+)
+
+
+def zipf_weights(count, exponent=1.1):
+    """Накопленные веса распределения Ципфа: несколько популярных
+    объектов и длинный хвост редких."""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+def draw_count(mean, limit):
+    """Случайное количество с экспоненциальным распределением и средним
+    около mean, не больше limit."""
+    if mean <= 0 or limit <= 0:
+        return 0
+    return min(limit, math.ceil(random.expovariate(1 / mean)))
+
+
+def draw_distinct(population, cum_weights, count):
+    """count различных объектов population с весами cum_weights."""
+    count = min(count, len(population))
+    chosen = {}
+    while len(chosen) < count:
+        for item in random.choices(
+                population, cum_weights=cum_weights, k=count - len(chosen)):
+            chosen.setdefault(item, None)
+    return list(chosen)
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетический набор данных для нагрузочного '
+            'тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--authors-share', type=float, default=0.2,
+            help='Доля пользователей, публикующих рецепты.')
+        parser.add_argument(
+            '--recipes-per-author', type=float, default=10,
+            help='Среднее число рецептов у автора.')
+        parser.add_argument('--min-ingredients', type=int, default=3)
+        parser.add_argument('--max-ingredients', type=int, default=15)
+        parser.add_argument(
+            '--favorites-per-user', type=float, default=15)
+        parser.add_argument('--carts-per-user', type=float, default=3)
+        parser.add_argument(
+            '--subscriptions-per-user', type=float, default=5)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты публикации.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredients = self.ensure_ingredients()
+        tags = self.ensure_tags()
+        users = self.create_users(options['users'])
+        authors = random.sample(
+            users, max(1, round(len(users) * options['authors_share'])))
+        recipes = self.create_recipes(
+            authors, options['recipes_per_author'], options['days'])
+        self.create_recipe_ingredients(
+            recipes, ingredients,
+            options['min_ingredients'], options['max_ingredients'])
+        self.create_recipe_tags(recipes, tags)
+        self.create_links(
+            Favorite, 'user', 'recipe', users, recipes,
+            options['favorites_per_user'])
+        self.create_links(
+            ShoppingCart, 'user', 'recipe', users, recipes,
+            options['carts_per_user'])
+        self.create_links(
+            Subscription, 'subscriber', 'author', users, authors,
+            options['subscriptions_per_user'], exclude_self=True)
+        refresh_shopping_lists(
+            ShoppingCart.objects.filter(user__in=users).values('user'))
+        ingredient_recipe_index.invalidate()
+        call_command('recount', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, авторов: {len(authors)}, '
+            f'рецептов: {len(recipes)}. Пароль пользователей: {PASSWORD}'))
+
+    def ensure_ingredients(self):
+        """Ингредиенты из базы; пустой справочник заполняется из
+        data/ingredients.csv."""
+        if not Ingredient.objects.exists():
+            with open(
+                f'{settings.BASE_DIR}/data/ingredients.csv',
+                'r',
+                encoding='utf-8'
+            ) as file:
+                Ingredient.objects.bulk_create(
+                    (Ingredient(**data) for data in csv.DictReader(file)),
+                    batch_size=self.batch_size,
+                )
+            ingredient_index.invalidate()
+        ingredients = list(Ingredient.objects.values_list('pk', flat=True))
+        random.shuffle(ingredients)
+        return ingredients
+
+    def ensure_tags(self):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(Tag(**tag) for tag in TAGS)
+            bump_version(TAGS_VERSION)
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def create_users(self, count):
+        start = User.objects.count()
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    email=f'seed{number}@example.com',
+                    username=f'seed{number}',
+                    first_name=f'Имя{number}',
+                    last_name=f'Фамилия{number}',
+                    password=password,
+                )
+                for number in range(start, start + count)
+            ),
+            batch_size=self.batch_size,
+        )
+        return [user.pk for user in users]
+
+    def create_recipes(self, authors, mean, days):
+        image = BytesIO()
+        Image.new('RGB', (600, 400), (230, 180, 120)).save(image, 'JPEG')
+        image_name = image_storage.save(
+            'images/seed.jpg', ContentFile(image.getvalue()))
+        now = timezone.now()
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=f'Рецепт {author}-{number}',
+                    text='Синтетический рецепт для нагрузочного теста.',
+                    author_id=author,
+                    image=image_name,
+                    cooking_time=min(
+                        600, 5 + math.ceil(random.lognormvariate(3, 0.7))),
+                )
+                for author in authors
+                for number in range(draw_count(mean, int(10 * mean)))
+            ),
+            batch_size=self.batch_size,
+        )
+        for recipe in recipes:
+            recipe.created = now - timedelta(
+                seconds=random.randrange(days * 24 * 60 * 60))
+        Recipe.objects.bulk_update(
+            recipes, ['created'], batch_size=self.batch_size)
+        return [recipe.pk for recipe in recipes]
+
+    def create_recipe_ingredients(self, recipes, ingredients, low, high):
+        cum_weights = zipf_weights(len(ingredients))
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe,
+                    ingredient_id=ingredient,
+                    amount=random.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient in draw_distinct(
+                    ingredients, cum_weights, random.randint(low, high))
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def create_recipe_tags(self, recipes, tags):
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            (
+                through(recipe_id=recipe, tag_id=tag)
+                for recipe in recipes
+                for tag in random.sample(tags, random.randint(1, len(tags)))
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def create_links(self, model, owner_field, target_field, owners, targets,
+                     mean, exclude_self=False):
+        """Связи пользователей с популярными объектами: число связей у
+        пользователя распределено экспоненциально, выбор объекта — по
+        закону Ципфа."""
+        if not targets:
+            return
+        popular = random.sample(targets, len(targets))
+        cum_weights = zipf_weights(len(popular))
+        model.objects.bulk_create(
+            (
+                model(**{f'{owner_field}_id': owner,
+                         f'{target_field}_id': target})
+                for owner in owners
+                for target in draw_distinct(
+                    popular, cum_weights, draw_count(mean, len(popular)))
+                if not exclude_self or target != owner
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
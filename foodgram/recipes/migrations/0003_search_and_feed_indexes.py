@@ -0,0 +1,39 @@
+# Generated by Django 4.1.4 on 2026-10-18 03:19
+
+from django.db import migrations, models
+
+INGREDIENT_NAME_UPPER_INDEX = 'ingredient_name_upper_like_idx'
+
+
+def create_ingredient_name_index(apps, schema_editor):
+    """Индекс для поиска по началу названия (UPPER(name) LIKE 'X%'),
+    который строит istartswith в PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INGREDIENT_NAME_UPPER_INDEX} '
+        'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)'
+    )
+
+
+def drop_ingredient_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'DROP INDEX IF EXISTS {INGREDIENT_NAME_UPPER_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created', 'name'], name='recipe_created_name_idx'),
+        ),
+        migrations.RunPython(
+            create_ingredient_name_index, drop_ingredient_name_index),
+    ]
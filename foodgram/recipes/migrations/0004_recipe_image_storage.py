@@ -0,0 +1,19 @@
+# Generated by Django 4.1.4 on 2026-10-18 03:23
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_search_and_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=recipes.storage.ContentAddressedStorage(), upload_to='images/', verbose_name='Фото'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.1.4 on 2026-10-18 03:33
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Оставляет по одному ингредиенту на пару (name, measurement_unit).
+    Ссылки на дубликаты переносятся на оставшийся ингредиент, количества
+    в одном рецепте или списке покупок складываются."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    groups = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(keep=Min('pk'), total=Count('pk'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        keep = group.pop('keep')
+        group.pop('total')
+        duplicates = list(
+            Ingredient.objects.filter(**group).exclude(pk=keep)
+            .values_list('pk', flat=True)
+        )
+        for model, owner in ((RecipeIngredient, 'recipe_id'),
+                             (ShoppingListItem, 'user_id')):
+            for row in model.objects.filter(ingredient__in=duplicates):
+                target = model.objects.filter(
+                    ingredient_id=keep, **{owner: getattr(row, owner)}
+                ).first()
+                if target is None:
+                    row.ingredient_id = keep
+                    row.save(update_fields=['ingredient'])
+                else:
+                    target.amount += row.amount
+                    target.save(update_fields=['amount'])
+                    row.delete()
+        Ingredient.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+    ]
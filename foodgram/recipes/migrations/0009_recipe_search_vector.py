@@ -0,0 +1,68 @@
+# Generated by Django 4.1.4 on 2026-10-18 03:35
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_INDEX = 'recipe_search_vector_gin_idx'
+
+
+def create_search_vector(apps, schema_editor):
+    """Триггер, поддерживающий search_vector по названию (вес A) и описанию
+    (вес B) в русской конфигурации, заполнение существующих рецептов
+    и GIN-индекс. Только для PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        """
+        CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update()
+        RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+                || setweight(
+                    to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    schema_editor.execute(
+        """
+        CREATE TRIGGER recipes_recipe_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, text, search_vector
+        ON recipes_recipe
+        FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update()
+        """
+    )
+    schema_editor.execute('UPDATE recipes_recipe SET name = name')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {SEARCH_VECTOR_INDEX} '
+        'ON recipes_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_VECTOR_INDEX}')
+    schema_editor.execute(
+        'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+        'ON recipes_recipe')
+    schema_editor.execute(
+        'DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_ingredient_name_unit_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
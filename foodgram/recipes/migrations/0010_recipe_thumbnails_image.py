@@ -0,0 +1,35 @@
+# Generated by Django 4.1.4 on 2026-10-18 04:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_thumbnails(apps, schema_editor):
+    """Отмечает готовыми миниатюры, которые уже лежат в хранилище."""
+    from recipes.images import thumbnail_name
+    from recipes.storage import image_storage
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    names = Recipe.objects.exclude(image='').order_by().values_list(
+        'image', flat=True).distinct()
+    for name in names.iterator():
+        if all(image_storage.exists(thumbnail_name(name, size))
+               for size in settings.THUMBNAIL_SIZES):
+            Recipe.objects.filter(image=name).update(thumbnails_image=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnails_image',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Изображение с готовыми миниатюрами'),
+        ),
+        migrations.RunPython(
+            mark_existing_thumbnails, migrations.RunPython.noop),
+    ]
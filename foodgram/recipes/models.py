@@ -1,10 +1,14 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.urls import reverse
+from users.models import CounterFieldsMixin
 
+from .storage import image_storage
 
-class Recipe(models.Model):
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель рецепта."""
     name = models.CharField(
         max_length=settings.MAX_LENGHT,
@@ -17,7 +21,8 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Автор',
     )
-    image = models.ImageField('Фото', upload_to='images/')
+    image = models.ImageField(
+        'Фото', upload_to='images/', storage=image_storage)
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления в минутах',
         validators=[
@@ -33,11 +38,26 @@ class Recipe(models.Model):
         through='RecipeIngredient'
     )
     created = models.DateTimeField('Дата создания', auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        'Добавления в избранное', default=0, editable=False)
+    search_vector = SearchVectorField(
+        'Поисковый вектор', null=True, editable=False)
+    thumbnails_image = models.CharField(
+        'Изображение с готовыми миниатюрами', max_length=100, blank=True,
+        editable=False)
+
+    counter_fields = ('favorites_count', 'thumbnails_image')
 
     class Meta:
         ordering = ['-created', 'name']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['-created', '-id'],
+                         name='recipe_created_id_idx'),
+            models.Index(fields=['-created', 'name'],
+                         name='recipe_created_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -88,6 +108,10 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'measurement_unit'],
+                                    name='unique_ingredient_name_unit')
+        ]
 
     def __str__(self):
         return f'{self.name} {self.measurement_unit}'
@@ -181,3 +205,35 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user}: {self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Денормализованная таблица, которая поддерживается сигналами корзины и
+    ингредиентов рецептов, чтобы список покупок читался одним запросом.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        ordering = ['user', 'ingredient']
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'ingredient'],
+                                    name='unique_user_shopping_list_item')
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} {self.amount}'
@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from users.services import count_of
+
+from .models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                     ShoppingListItem)
+
+User = get_user_model()
+
+refresh_deferred = ContextVar('refresh_deferred', default=False)
+
+
+def change_favorites_count(recipe_ids, delta):
+    """Меняет счётчик добавлений в избранное у рецептов recipe_ids."""
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        favorites_count=Greatest(F('favorites_count') + delta, 0))
+
+
+def recount_favorites(recipe_ids):
+    """Пересчитывает счётчик добавлений в избранное у рецептов recipe_ids
+    по таблице избранного."""
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        favorites_count=count_of(Favorite.objects.all(), 'recipe'))
+
+
+def refresh_shopping_lists(users, ingredients=None):
+    """Пересчитывает списки покупок пользователей users.
+
+    users и ingredients могут быть списками id или подзапросами. Если
+    ingredients передан, пересчитываются только строки этих ингредиентов,
+    иначе список покупок строится заново. Строки пользователей
+    блокируются до конца транзакции, чтобы параллельные пересчёты одного
+    списка выполнялись по очереди. Блокировка FOR NO KEY UPDATE
+    совместима с FOR KEY SHARE, которую на ту же строку берёт проверка
+    внешнего ключа при вставке в корзину, поэтому две транзакции,
+    добавляющие рецепты в корзину одного пользователя, не блокируют
+    друг друга взаимно.
+    """
+    items = ShoppingListItem.objects.filter(user__in=users)
+    totals = RecipeIngredient.objects.filter(
+        recipe__shopping_cart__user__in=users)
+    if ingredients is not None:
+        items = items.filter(ingredient__in=ingredients)
+        totals = totals.filter(ingredient__in=ingredients)
+    totals = (
+        totals.values('recipe__shopping_cart__user', 'ingredient')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    with transaction.atomic():
+        list(
+            User.objects.filter(pk__in=users).order_by('pk')
+            .select_for_update(no_key=True).values_list('pk', flat=True)
+        )
+        items.delete()
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=row['recipe__shopping_cart__user'],
+                    ingredient_id=row['ingredient'],
+                    amount=row['total'],
+                )
+                for row in totals
+            ),
+            update_conflicts=True,
+            unique_fields=('user', 'ingredient'),
+            update_fields=('amount',),
+        )
+
+
+@contextmanager
+def defer_refresh():
+    """Отключает пересчёт списков покупок в сигналах ингредиентов рецептов,
+    вызывающий код пересчитывает их сам одним вызовом."""
+    token = refresh_deferred.set(True)
+    try:
+        yield
+    finally:
+        refresh_deferred.reset(token)
+
+
+def cart_holders(recipe_id):
+    """Подзапрос пользователей, у которых рецепт лежит в корзине."""
+    return ShoppingCart.objects.filter(recipe_id=recipe_id).values('user')
+
+
+def recipe_ingredients(recipe_id):
+    """Подзапрос ингредиентов рецепта."""
+    return RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values('ingredient')
@@ -0,0 +1,160 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from users.models import Subscription
+from users.services import change_recipes_count
+
+from .cache import TAGS_VERSION, bump_version, bump_versions, feed_version_key
+from .images import release_image
+from .indexes import ingredient_index, ingredient_recipe_index
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, Tag)
+from .services import (cart_holders, change_favorites_count,
+                       recipe_ingredients, refresh_deferred,
+                       refresh_shopping_lists)
+from .similarity import similar_recipes
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_version(TAGS_VERSION)
+
+
+@receiver(pre_save, sender=Recipe)
+def release_replaced_image(instance, update_fields=None, **kwargs):
+    """Освобождает прежнее изображение рецепта при его замене."""
+    if instance.pk is None or (
+            update_fields is not None and 'image' not in update_fields):
+        return
+    old_name = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list('image', flat=True).first()
+    )
+    if old_name and old_name != instance.image.name:
+        transaction.on_commit(lambda: release_image(old_name))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_deleted_image(instance, **kwargs):
+    name = instance.image.name
+    transaction.on_commit(lambda: release_image(name))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    if created:
+        refresh_shopping_lists(
+            [instance.user_id], recipe_ingredients(instance.recipe_id))
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    refresh_shopping_lists(
+        [instance.user_id], recipe_ingredients(instance.recipe_id))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_recipe_index(instance, created, **kwargs):
+    """Ингредиент существующей строки мог смениться (например, в админке),
+    прежнее значение неизвестно, поэтому индекс строится заново."""
+    if created:
+        ingredient_recipe_index.add(
+            instance.recipe_id, [instance.ingredient_id])
+    else:
+        ingredient_recipe_index.invalidate()
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_from_recipe_index(instance, **kwargs):
+    ingredient_recipe_index.remove(
+        instance.recipe_id, [instance.ingredient_id])
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def mark_ingredients_changed(instance, **kwargs):
+    similar_recipes.mark_changed(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def mark_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        similar_recipes.mark_changed(instance.pk)
+    else:
+        for recipe_id in pk_set or ():
+            similar_recipes.mark_changed(recipe_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def mark_recipe_deleted(instance, **kwargs):
+    similar_recipes.mark_changed(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_shopping_lists(instance, created, **kwargs):
+    if refresh_deferred.get():
+        return
+    if created:
+        refresh_shopping_lists(
+            cart_holders(instance.recipe_id), [instance.ingredient_id])
+    else:
+        refresh_shopping_lists(cart_holders(instance.recipe_id))
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_from_shopping_lists(instance, **kwargs):
+    if refresh_deferred.get():
+        return
+    refresh_shopping_lists(
+        cart_holders(instance.recipe_id), [instance.ingredient_id])
+
+
+@receiver(post_save, sender=Favorite)
+def increase_favorites_count(instance, created, **kwargs):
+    if created:
+        change_favorites_count([instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrease_favorites_count(instance, **kwargs):
+    change_favorites_count([instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(instance, created, **kwargs):
+    if created:
+        change_recipes_count([instance.author_id], 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(instance, **kwargs):
+    change_recipes_count([instance.author_id], -1)
+
+
+def invalidate_subscriber_feeds(author_id):
+    """После коммита сбрасывает ленты всех подписчиков автора."""
+    def bump():
+        bump_versions(
+            feed_version_key(subscriber) for subscriber in
+            Subscription.objects.filter(author_id=author_id)
+            .values_list('subscriber_id', flat=True)
+        )
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_feeds_on_publish(instance, created, **kwargs):
+    if created:
+        invalidate_subscriber_feeds(instance.author_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_feeds_on_delete(instance, **kwargs):
+    invalidate_subscriber_feeds(instance.author_id)
@@ -0,0 +1,254 @@
+import json
+import os
+import shutil
+import uuid
+from itertools import chain
+from threading import Lock
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import ChangeJournal
+from .models import Recipe, RecipeIngredient
+
+MANIFEST = 'current.json'
+ARRAYS = ('recipe_ids', 'features', 'indptr', 'rows', 'values')
+
+
+def read_pairs(queryset, *fields):
+    """Пары значений fields из queryset массивом n × 2 без создания
+    промежуточных списков."""
+    rows = queryset.order_by().values_list(*fields).iterator(chunk_size=10000)
+    return np.fromiter(
+        chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+
+
+def load_features(condition=None):
+    """Признаки рецептов: массивы id рецепта, ключа признака и веса.
+    Ключ ингредиента — 2 * id, тега — 2 * id + 1."""
+    tags = Recipe.tags.through.objects.all()
+    ingredients = RecipeIngredient.objects.all()
+    if condition is not None:
+        tags, ingredients = tags.filter(condition), ingredients.filter(
+            condition)
+    ingredients = read_pairs(ingredients, 'recipe_id', 'ingredient_id')
+    tags = read_pairs(tags, 'recipe_id', 'tag_id')
+    recipes = np.concatenate((ingredients[:, 0], tags[:, 0]))
+    keys = np.concatenate((ingredients[:, 1] * 2, tags[:, 1] * 2 + 1))
+    weights = np.concatenate((
+        np.ones(len(ingredients)),
+        np.full(len(tags), settings.SIMILAR_RECIPES_TAG_WEIGHT),
+    ))
+    return recipes, keys, weights
+
+
+def normalize(rows, weights):
+    """Веса признаков, делённые на длину вектора своей строки."""
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights))
+    return weights / norms[rows]
+
+
+def build_matrix():
+    """Нормированная матрица рецепты × признаки в формате CSC: для
+    каждого признака — номера строк рецептов и веса подряд."""
+    recipes, keys, weights = load_features()
+    recipe_ids, rows = np.unique(recipes, return_inverse=True)
+    features, columns = np.unique(keys, return_inverse=True)
+    values = normalize(rows, weights).astype(np.float32)
+    order = np.lexsort((rows, columns))
+    indptr = np.zeros(len(features) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(columns, minlength=len(features)), out=indptr[1:])
+    return {
+        'recipe_ids': recipe_ids,
+        'features': features,
+        'indptr': indptr,
+        'rows': rows[order].astype(np.int32),
+        'values': values[order],
+    }
+
+
+class SimilarRecipes:
+    """Похожие рецепты по косинусной близости векторов ингредиентов и тегов.
+
+    Матрица строится командой build_similar_recipes и хранится в файлах
+    .npy, которые процессы открывают через mmap и делят через страничный
+    кеш. Рецепты, созданные после построения или изменённые (журнал
+    в кеше default), векторизуются из базы данных при каждом запросе
+    и сравниваются одним пакетом, их строки в матрице не используются.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._journal = ChangeJournal(
+            'similar-recipes', settings.SIMILAR_RECIPES_JOURNAL_TIMEOUT)
+        self._mtime = None
+        self._matrix = None
+        self._meta = {'max_recipe_id': 0}
+        self._applied = 0
+        self._changed = {}
+
+    def _load(self):
+        path = os.path.join(settings.SIMILAR_RECIPES_DIR, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        if mtime is None:
+            self._matrix, self._meta = None, {'max_recipe_id': 0}
+        else:
+            with open(path, encoding='utf-8') as file:
+                meta = json.load(file)
+            directory = os.path.join(
+                settings.SIMILAR_RECIPES_DIR, meta['build'])
+            self._matrix = {
+                name: np.load(
+                    os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+                for name in ARRAYS
+            }
+            self._meta = meta
+            self._applied = meta['sequence']
+            self._changed = {}
+        self._mtime = mtime
+
+    def _sync(self):
+        self._load()
+        if self._matrix is None:
+            return
+        sequence = self._journal.sequence()
+        if sequence > self._applied:
+            changes, _ = self._journal.read(self._applied + 1, sequence)
+            for recipe_id in changes:
+                self._changed.pop(recipe_id, None)
+                self._changed[recipe_id] = None
+            while len(self._changed) > settings.SIMILAR_RECIPES_MAX_PENDING:
+                del self._changed[next(iter(self._changed))]
+            self._applied = sequence
+
+    def mark_changed(self, recipe_id):
+        """После коммита помечает вектор рецепта в матрице устаревшим."""
+        transaction.on_commit(lambda: self._journal.record(recipe_id))
+
+    def build(self):
+        """Строит матрицу и делает её текущей для всех процессов."""
+        directory = settings.SIMILAR_RECIPES_DIR
+        sequence = self._journal.sequence()
+        max_recipe_id = (
+            Recipe.objects.order_by('-pk').values_list('pk', flat=True)
+            .first() or 0
+        )
+        matrix = build_matrix()
+        build = uuid.uuid4().hex
+        os.makedirs(os.path.join(directory, build))
+        for name, array in matrix.items():
+            np.save(os.path.join(directory, build, f'{name}.npy'), array)
+        meta = {
+            'build': build,
+            'sequence': sequence,
+            'max_recipe_id': max_recipe_id,
+            'created': timezone.now().isoformat(),
+        }
+        path = os.path.join(directory, MANIFEST)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(f'{path}.tmp', path)
+        for name in os.listdir(directory):
+            if name != build and os.path.isdir(os.path.join(directory, name)):
+                shutil.rmtree(os.path.join(directory, name),
+                              ignore_errors=True)
+        return matrix, meta
+
+    @staticmethod
+    def _pending_condition(recipe_id, changed, max_recipe_id):
+        """Рецепты, векторы которых берутся из базы данных: сам рецепт,
+        изменённые и последние созданные после построения матрицы."""
+        latest = (
+            Recipe.objects.filter(pk__gt=max_recipe_id)
+            .order_by('-pk').values('pk')
+            [:settings.SIMILAR_RECIPES_MAX_PENDING]
+        )
+        return (Q(recipe_id__in=[recipe_id, *changed])
+                | Q(recipe_id__in=latest))
+
+    def search(self, recipe_id, limit):
+        """Не больше limit пар (id рецепта, близость) в порядке убывания
+        близости к рецепту recipe_id."""
+        with self._lock:
+            self._sync()
+            matrix, changed = self._matrix, list(self._changed)
+            max_recipe_id = self._meta['max_recipe_id']
+        recipes, keys, weights = load_features(
+            self._pending_condition(recipe_id, changed, max_recipe_id))
+        pending_ids, rows = np.unique(recipes, return_inverse=True)
+        if recipe_id not in pending_ids:
+            return []
+        values = normalize(rows, weights)
+        own = rows == np.searchsorted(pending_ids, recipe_id)
+        query_keys, query_values = keys[own], values[own]
+        order = np.argsort(query_keys)
+        query_keys, query_values = query_keys[order], query_values[order]
+        query_weights = self._lookup(query_keys, query_values, keys)
+        scores = np.bincount(
+            rows, weights=values * query_weights, minlength=len(pending_ids))
+        candidates = [(pending_ids, scores)]
+        if matrix is not None:
+            candidates.append(self._matrix_scores(
+                matrix, query_keys, query_values,
+                np.union1d(pending_ids, np.array(changed, dtype=np.int64)),
+                limit))
+        recipe_ids = np.concatenate([ids for ids, _ in candidates])
+        scores = np.concatenate([score for _, score in candidates])
+        keep = (scores > 0) & (recipe_ids != recipe_id)
+        recipe_ids, scores = recipe_ids[keep], scores[keep].round(6)
+        order = np.lexsort((-recipe_ids, -scores))[:limit]
+        return [(int(pk), float(score))
+                for pk, score in zip(recipe_ids[order], scores[order])]
+
+    @staticmethod
+    def _lookup(query_keys, query_values, keys):
+        """Веса признаков keys в векторе запроса, 0 для отсутствующих."""
+        if not len(query_keys):
+            return np.zeros(len(keys))
+        positions = np.minimum(
+            np.searchsorted(query_keys, keys), len(query_keys) - 1)
+        return np.where(
+            query_keys[positions] == keys, query_values[positions], 0)
+
+    @staticmethod
+    def _matrix_scores(matrix, query_keys, query_values, exclude, limit):
+        """Лучшие limit строк матрицы (с равными последнему) по скалярному
+        произведению с вектором запроса; читаются только столбцы признаков
+        запроса."""
+        features, indptr = matrix['features'], matrix['indptr']
+        recipe_ids = matrix['recipe_ids']
+        columns = np.searchsorted(features, query_keys)
+        found = columns < len(features)
+        found[found] = features[columns[found]] == query_keys[found]
+        columns, column_values = columns[found], query_values[found]
+        starts, ends = indptr[columns], indptr[columns + 1]
+        rows = np.concatenate(
+            [matrix['rows'][start:end] for start, end in zip(starts, ends)]
+            or [np.empty(0, dtype=np.int32)])
+        values = np.concatenate(
+            [matrix['values'][start:end] for start, end in zip(starts, ends)]
+            or [np.empty(0, dtype=np.float32)])
+        scores = np.bincount(
+            rows, weights=values * np.repeat(column_values, ends - starts),
+            minlength=len(recipe_ids))
+        positions = np.searchsorted(recipe_ids, exclude)
+        inside = positions < len(recipe_ids)
+        positions = positions[inside]
+        scores[positions[recipe_ids[positions] == exclude[inside]]] = 0
+        count = min(limit, len(scores))
+        if not count:
+            return recipe_ids[:0], scores[:0]
+        threshold = -np.partition(-scores, count - 1)[count - 1]
+        top = np.flatnonzero(scores >= max(threshold, np.finfo(
+            np.float32).tiny))
+        return recipe_ids[top], scores[top]
+
+
+similar_recipes = SimilarRecipes()
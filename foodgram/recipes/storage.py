@@ -0,0 +1,41 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, которое называет файлы по хешу содержимого.
+
+    Одинаковые файлы получают одно имя и записываются на диск один раз,
+    повторная загрузка того же изображения только обновляет время
+    изменения файла и возвращает имя. По этому времени release_image
+    и gc_images не удаляют файлы, которые могла только что получить ещё
+    не закоммиченная транзакция.
+    """
+    def get_content_name(self, name, content):
+        sha256 = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        content.seek(0)
+        digest = sha256.hexdigest()
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            os.path.dirname(name), digest[:2], f'{digest}{ext}')
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super().save(name, content, max_length)
+        return name
+
+
+image_storage = ContentAddressedStorage()
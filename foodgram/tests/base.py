@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+from users.models import User
+
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+
+class QueryBudgetMixin:
+    """Проверка верхней границы числа запросов к базе данных."""
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context)
+        self.assertLessEqual(
+            executed, budget,
+            f'{executed} запросов при бюджете {budget}:\n' + '\n'.join(
+                query['sql'] for query in context.captured_queries))
+
+
+class APIDataTestCase(QueryBudgetMixin, APITestCase):
+    """Тесты API с набором ингредиентов, тегов и пользователей.
+    Файлы изображений пишутся во временный каталог."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(20)
+        )
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag{number}')
+            for number in range(3)
+        )
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@example.com', username=f'user{number}',
+                password='test-password')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = self.client_for(self.users[0])
+
+    def client_for(self, user):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def create_recipes(self, count, author=None, ingredients=5):
+        """count рецептов с ingredients ингредиентами и всеми тегами."""
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {number}', text='Текст рецепта.',
+                cooking_time=10, image='images/test.png',
+                author=author or self.users[number % len(self.users)],
+            )
+            for number in range(count)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for recipe in recipes
+            for ingredient in self.ingredients[:ingredients]
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in self.tags
+        )
+        return recipes
+
+    def recipe_payload(self, ingredients=12):
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Текст рецепта.',
+            'cooking_time': 15,
+            'image': PNG,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': number + 1}
+                for number, ingredient in
+                enumerate(self.ingredients[:ingredients])
+            ],
+        }
@@ -0,0 +1,43 @@
+from api.authentication import TokenCache, token_cache
+from django.conf import settings
+from rest_framework.authtoken.models import Token
+
+from .base import APIDataTestCase
+
+
+class TokenCacheTests(APIDataTestCase):
+    """Отзыв токена в одном процессе действует на кеши всех процессов,
+    которые делят общий кеш."""
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.token = Token.objects.get(user=self.users[0])
+        self.other_process = TokenCache(
+            settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL,
+            settings.AUTH_TOKEN_SHARED_CACHE)
+        self.client.get('/api/users/me/')
+        self.other_process.set(
+            self.token.key, token_cache.get(self.token.key), 0)
+
+    def test_logout_revokes_token_in_other_processes(self):
+        self.assertIsNotNone(self.other_process.get(self.token.key))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(self.other_process.get(self.token.key))
+
+    def test_deactivation_revokes_token_in_other_processes(self):
+        user = self.users[0]
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertIsNone(self.other_process.get(self.token.key))
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_token_loaded_after_revocation_is_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[0].save()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        self.assertIsNotNone(token_cache.get(self.token.key))
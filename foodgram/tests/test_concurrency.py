@@ -0,0 +1,112 @@
+import threading
+from functools import partial
+from unittest import skipUnless
+
+from api import bulk
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem)
+from recipes.services import (change_favorites_count, recount_favorites,
+                              refresh_shopping_lists)
+from users.models import User
+
+TIMEOUT = 10
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Блокировки строк только в PostgreSQL.')
+class ConcurrencyTests(TransactionTestCase):
+    """Параллельные изменения корзины, избранного одного пользователя или
+    рецепта не приводят к взаимной блокировке и не теряют изменений
+    счётчиков."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            password='test-password')
+        self.other = User.objects.create_user(
+            email='other@example.com', username='other',
+            password='test-password')
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)
+        )
+        self.recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {number}', text='Текст рецепта.',
+                cooking_time=10, image='images/test.png', author=self.user,
+            )
+            for number in range(2)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for recipe in self.recipes for ingredient in ingredients
+        )
+
+    def run_concurrently(self, *targets):
+        """Выполняет каждую функцию targets(barrier) в отдельном потоке со
+        своим соединением; возвращает исключения потоков."""
+        barrier = threading.Barrier(len(targets), timeout=TIMEOUT)
+        errors = []
+
+        def run(target):
+            try:
+                target(barrier)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(target,))
+                   for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(TIMEOUT * 2)
+        return errors
+
+    def test_concurrent_cart_adds(self):
+        """Вставка в корзину берёт FOR KEY SHARE на строку пользователя
+        раньше, чем пересчёт списка блокирует её."""
+        def add(barrier, recipe):
+            with transaction.atomic():
+                ShoppingCart.objects.bulk_create(
+                    [ShoppingCart(user=self.user, recipe=recipe)])
+                barrier.wait()
+                refresh_shopping_lists(
+                    [self.user.pk], RecipeIngredient.objects.filter(
+                        recipe=recipe).values('ingredient'))
+
+        errors = self.run_concurrently(*(
+            partial(add, recipe=recipe) for recipe in self.recipes))
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            sorted(ShoppingListItem.objects.filter(
+                user=self.user).values_list('amount', flat=True)),
+            [20, 20, 20])
+
+    def test_bulk_and_single_favorite(self):
+        """Одиночное добавление в избранное держит FOR KEY SHARE на строке
+        рецепта, пакетное блокирует её FOR NO KEY UPDATE."""
+        recipe = self.recipes[0]
+
+        def single(barrier):
+            with transaction.atomic():
+                Favorite.objects.bulk_create(
+                    [Favorite(user=self.user, recipe=recipe)])
+                barrier.wait()
+                change_favorites_count([recipe.pk], 1)
+
+        def bulk_add(barrier):
+            with transaction.atomic():
+                barrier.wait()
+                created, _ = bulk.bulk_add(
+                    Favorite, 'user', self.other, 'recipe', [recipe.pk],
+                    bulk.lock_ids(Recipe.objects.filter(pk=recipe.pk)))
+                recount_favorites(created)
+
+        errors = self.run_concurrently(single, bulk_add)
+        self.assertEqual(errors, [])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 2)
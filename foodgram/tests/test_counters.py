@@ -0,0 +1,77 @@
+from recipes.models import Favorite, Recipe
+from users.models import Subscription, User
+
+from .base import APIDataTestCase
+
+
+class CounterTests(APIDataTestCase):
+    """Обычное сохранение пользователя или рецепта не затирает
+    денормализованные счётчики."""
+
+    def test_set_password_keeps_subscribers_count(self):
+        author = self.users[1]
+        author_client = self.client_for(author)
+        author_client.get('/api/users/me/')
+        self.client.post(f'/api/users/{author.pk}/subscribe/')
+        response = author_client.post(
+            '/api/users/set_password/',
+            {'current_password': 'test-password',
+             'new_password': 'new-test-password'},
+            format='json')
+        self.assertEqual(response.status_code, 204, response.data)
+        author.refresh_from_db()
+        self.assertEqual(author.subscribers_count, 1)
+        response = self.client.delete(f'/api/users/{author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+        author.refresh_from_db()
+        self.assertEqual(author.subscribers_count, 0)
+
+    def test_full_save_keeps_counters(self):
+        recipe = self.create_recipes(1, author=self.users[1])[0]
+        stale_user = User.objects.get(pk=self.users[1].pk)
+        stale_recipe = Recipe.objects.get(pk=recipe.pk)
+        self.client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        self.client.post(f'/api/users/{stale_user.pk}/subscribe/')
+        stale_user.first_name = 'Новое имя'
+        stale_user.save()
+        stale_recipe.name = 'Новое название'
+        stale_recipe.save()
+        stale_user.refresh_from_db()
+        stale_recipe.refresh_from_db()
+        self.assertEqual(stale_user.first_name, 'Новое имя')
+        self.assertEqual(stale_user.subscribers_count, 1)
+        self.assertEqual(stale_recipe.name, 'Новое название')
+        self.assertEqual(stale_recipe.favorites_count, 1)
+
+    def test_counter_does_not_go_below_zero(self):
+        author = self.users[1]
+        self.client.post(f'/api/users/{author.pk}/subscribe/')
+        User.objects.filter(pk=author.pk).update(subscribers_count=0)
+        response = self.client.delete(f'/api/users/{author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+        author.refresh_from_db()
+        self.assertEqual(author.subscribers_count, 0)
+
+    def test_bulk_add_recounts_counters(self):
+        """Связи, созданные параллельным запросом между проверкой
+        и вставкой, не увеличивают счётчики повторно."""
+        recipes = self.create_recipes(2, author=self.users[1])
+        Favorite.objects.bulk_create(
+            Favorite(user=self.users[2], recipe=recipe) for recipe in recipes)
+        Subscription.objects.create(
+            subscriber=self.users[2], author=self.users[1])
+        User.objects.filter(pk=self.users[1].pk).update(subscribers_count=5)
+        response = self.client.post(
+            '/api/recipes/favorite/',
+            {'ids': [recipe.pk for recipe in recipes]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        response = self.client.post(
+            '/api/users/subscribe/', {'ids': [self.users[1].pk]},
+            format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [recipe.favorites_count for recipe in
+             Recipe.objects.filter(pk__in=[r.pk for r in recipes])],
+            [2, 2])
+        self.users[1].refresh_from_db()
+        self.assertEqual(self.users[1].subscribers_count, 2)
@@ -0,0 +1,25 @@
+from .base import APIDataTestCase
+
+
+class FeedCacheTests(APIDataTestCase):
+    """Закешированная первая страница ленты не зависит от параметров
+    запроса, который её закешировал."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_recipes(6, author=self.users[1])
+        self.client.post(f'/api/users/{self.users[1].pk}/subscribe/')
+
+    def test_next_link_follows_current_request(self):
+        sparse = self.client.get('/api/recipes/feed/?fields=id&limit=2')
+        self.assertEqual(list(sparse.data['results'][0]), ['id'])
+        self.assertIn('fields=id', sparse.data['next'])
+        full = self.client.get('/api/recipes/feed/?limit=2')
+        self.assertNotIn('fields', full.data['next'])
+        self.assertIn('ingredients', full.data['results'][0])
+        second = self.client.get(full.data['next'])
+        self.assertIn('ingredients', second.data['results'][0])
+        self.assertEqual(
+            [recipe['id'] for recipe in second.data['results']],
+            [recipe['id'] for recipe in self.client.get(
+                sparse.data['next']).data['results']])
@@ -0,0 +1,92 @@
+from unittest import skipIf
+
+from api.filters import RecipeFilter
+from api.paginations import LimitCursorPagination
+from django.db import connection
+from recipes.indexes import ingredient_recipe_index
+from recipes.models import Recipe
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .base import APIDataTestCase
+
+
+class IngredientFilterTests(APIDataTestCase):
+    """Фильтр по ингредиентам передаёт найденные по индексу рецепты
+    в запрос одним параметром, сколько бы их ни было."""
+
+    def filtered(self, ingredients):
+        return RecipeFilter(
+            data={'ingredients': ','.join(
+                str(ingredient.pk) for ingredient in ingredients)},
+            queryset=Recipe.objects.all(),
+        ).qs
+
+    def test_query_parameters_do_not_grow_with_matches(self):
+        self.create_recipes(5, ingredients=3)
+        _, few = self.filtered(self.ingredients[:2]).query.sql_with_params()
+        recipes = self.create_recipes(60, ingredients=3)
+        ingredient_recipe_index.invalidate()
+        queryset = self.filtered(self.ingredients[:2])
+        _, many = queryset.query.sql_with_params()
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(queryset.count(), 65)
+        self.assertIn(recipes[0], queryset)
+
+    def test_all_ingredients_required(self):
+        self.create_recipes(4, ingredients=2)
+        self.create_recipes(3, ingredients=4)
+        self.assertEqual(
+            self.filtered(self.ingredients[1:4]).count(), 3)
+        self.assertFalse(self.filtered(self.ingredients[10:12]).exists())
+
+
+class SearchFilterTests(APIDataTestCase):
+    """Поиск по названию и описанию: совпадения в названии выше."""
+
+    def setUp(self):
+        super().setUp()
+        self.in_text, self.in_name, self.other, self.in_name_later = (
+            Recipe.objects.create(
+                name=name, text=text, cooking_time=10,
+                image='images/test.png', author=self.users[0])
+            for name, text in (
+                ('Суп', 'Подавать как борщ.'),
+                ('Красный борщ', 'Свёкла и капуста.'),
+                ('Салат', 'Огурцы и помидоры.'),
+                ('Зелёный борщ', 'Щавель и яйца.'),
+            )
+        )
+
+    def searched(self, value):
+        return RecipeFilter(
+            data={'search': value}, queryset=Recipe.objects.all()).qs
+
+    def test_name_matches_first(self):
+        self.assertEqual(
+            list(self.searched('борщ')),
+            [self.in_name_later, self.in_name, self.in_text])
+
+    def test_blank_search_ignored(self):
+        self.assertEqual(self.searched('  ').count(), 4)
+
+    @skipIf(connection.vendor == 'postgresql',
+            'Поиск подстроки только вне PostgreSQL.')
+    def test_substring_fallback(self):
+        self.assertEqual(
+            list(self.searched('орщ')),
+            [self.in_name_later, self.in_name, self.in_text])
+        self.assertEqual(
+            list(self.searched('помидор')), [self.other])
+
+    def test_cursor_follows_rank(self):
+        ids = []
+        url = '/api/recipes/?limit=1'
+        while url is not None:
+            paginator = LimitCursorPagination()
+            page = paginator.paginate_queryset(
+                self.searched('борщ'), Request(APIRequestFactory().get(url)))
+            ids.extend(recipe.pk for recipe in page)
+            url = paginator.get_next_link()
+        self.assertEqual(
+            ids, [self.in_name_later.pk, self.in_name.pk, self.in_text.pk])
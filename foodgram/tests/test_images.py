@@ -0,0 +1,102 @@
+import os
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from recipes.images import (make_thumbnails, mark_thumbnails_ready,
+                            release_image, thumbnail_name)
+from recipes.models import Recipe
+from recipes.storage import image_storage
+
+from .base import PNG, APIDataTestCase
+
+
+class ReleaseImageTests(APIDataTestCase):
+    """Файл изображения удаляется вместе с последним рецептом, только если
+    его давно не загружали повторно."""
+
+    def create_recipe(self):
+        response = self.client.post(
+            '/api/recipes/', self.recipe_payload(ingredients=2),
+            format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(pk=response.data['id'])
+
+    def age(self, name, seconds):
+        moment = time.time() - seconds
+        os.utime(image_storage.path(name), (moment, moment))
+
+    def delete(self, recipe):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_old_unreferenced_image_is_removed(self):
+        recipe = self.create_recipe()
+        name = recipe.image.name
+        self.age(name, settings.IMAGE_RELEASE_MIN_AGE + 1)
+        self.delete(recipe)
+        self.assertFalse(image_storage.exists(name))
+
+    def test_recent_image_is_kept(self):
+        recipe = self.create_recipe()
+        self.delete(recipe)
+        self.assertTrue(image_storage.exists(recipe.image.name))
+
+    def test_reupload_protects_image(self):
+        recipe = self.create_recipe()
+        name = recipe.image.name
+        self.age(name, settings.IMAGE_RELEASE_MIN_AGE + 1)
+        other = self.create_recipe()
+        self.assertEqual(other.image.name, name)
+        Recipe.objects.filter(pk__in=[recipe.pk, other.pk]).delete()
+        release_image(name)
+        self.assertTrue(image_storage.exists(name))
+
+    def test_gc_images_uses_release_age(self):
+        recipe = self.create_recipe()
+        young = image_storage.save('images/young.png', ContentFile(b'young'))
+        old = image_storage.save('images/old.png', ContentFile(b'old'))
+        self.age(old, settings.IMAGE_RELEASE_MIN_AGE + 1)
+        self.age(recipe.image.name, settings.IMAGE_RELEASE_MIN_AGE + 1)
+        call_command('gc_images', stdout=StringIO())
+        self.assertTrue(image_storage.exists(recipe.image.name))
+        self.assertTrue(image_storage.exists(young))
+        self.assertFalse(image_storage.exists(old))
+
+
+class ThumbnailTests(APIDataTestCase):
+    """Ссылки на миниатюры строятся по отметке готовности без обращений
+    к хранилищу."""
+
+    def test_thumbnails_follow_ready_mark(self):
+        response = self.client.post(
+            '/api/recipes/', self.recipe_payload(ingredients=2),
+            format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(
+            set(response.data['thumbnails'].values()),
+            {response.data['image']})
+        name = Recipe.objects.get(pk=response.data['id']).image.name
+        mark_thumbnails_ready(name)
+        thumbnails = self.client.get(
+            f'/api/recipes/{response.data["id"]}/').data['thumbnails']
+        for size, url in thumbnails.items():
+            self.assertTrue(url.endswith(
+                image_storage.url(thumbnail_name(name, size))))
+            self.assertFalse(
+                image_storage.exists(thumbnail_name(name, size)))
+        make_thumbnails(name)
+        for size in settings.THUMBNAIL_SIZES:
+            self.assertTrue(
+                image_storage.exists(thumbnail_name(name, size)))
+
+    def test_base64_with_line_breaks(self):
+        payload = self.recipe_payload(ingredients=2)
+        header, data = PNG.split(',')
+        payload['image'] = header + ',' + '\n'.join(
+            data[start:start + 20] for start in range(0, len(data), 20))
+        response = self.client.post('/api/recipes/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
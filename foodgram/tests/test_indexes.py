@@ -0,0 +1,73 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from recipes.indexes import IngredientPrefixIndex
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+from .base import APIDataTestCase
+
+INGREDIENTS = 5000
+RECIPES = 5000
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Индексы только в PostgreSQL.')
+class IndexUsageTests(TestCase):
+    """Планировщик PostgreSQL использует индексы из миграции
+    recipes.0003_search_and_feed_indexes на заполненных таблицах."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number:05d}', measurement_unit='г')
+            for number in range(INGREDIENTS)
+        )
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='test-password')
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {number % 100}', text='Текст рецепта.',
+                cooking_time=10, image='images/test.png', author=author,
+            )
+            for number in range(RECIPES)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE recipes_recipe "
+                "SET created = now() - id * interval '1 minute'")
+            cursor.execute('ANALYZE recipes_ingredient')
+            cursor.execute('ANALYZE recipes_recipe')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan, plan)
+
+    def test_ingredient_prefix_search(self):
+        self.assertUsesIndex(
+            Ingredient.objects.filter(name__istartswith='ингредиент 0012'),
+            'ingredient_name_upper_like_idx')
+
+    def test_recipe_default_ordering(self):
+        self.assertUsesIndex(
+            Recipe.objects.order_by('-created', 'name')[:10],
+            'recipe_created_name_idx')
+
+
+class IngredientPrefixIndexTests(APIDataTestCase):
+    """Поиск ингредиентов по началу названия в индексе процесса."""
+
+    def test_search(self):
+        index = IngredientPrefixIndex()
+        self.assertEqual(
+            [row['id'] for row in index.search('ингредиент 1')],
+            [self.ingredients[1].pk]
+            + [ingredient.pk for ingredient in self.ingredients[10:]])
+        self.assertEqual(len(index.search(limit=3)), 3)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_search_without_cache(self):
+        self.assertEqual(
+            len(IngredientPrefixIndex().search('ингредиент')), 20)
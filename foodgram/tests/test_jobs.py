@@ -0,0 +1,76 @@
+import json
+import os
+import time
+import uuid
+
+from api import jobs
+from django.conf import settings
+from django.test import override_settings
+
+from .base import APIDataTestCase
+
+
+class ShoppingCartJobTests(APIDataTestCase):
+    """Задания отрисовки списка покупок переживают потерю пула процессов,
+    в котором были поставлены в очередь."""
+
+    def setUp(self):
+        super().setUp()
+        jobs_dir = os.path.join(self.media_root, 'jobs')
+        os.makedirs(jobs_dir, exist_ok=True)
+        self.jobs_settings = override_settings(SHOPPING_LIST_JOBS_DIR=jobs_dir)
+        self.jobs_settings.enable()
+        self.addCleanup(self.jobs_settings.disable)
+
+    def lost_job(self, *files, age=60):
+        """Задание в статусе pending из пула, которого уже нет: файлы
+        files задания созданы age секунд назад."""
+        job_id = str(uuid.uuid4())
+        jobs._write_meta(job_id, self.users[0].pk, jobs.PENDING)
+        for ext in files:
+            path = jobs._path(job_id, ext)
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump({'user': self.users[0].pk, 'shopping_list': []},
+                          file)
+            moment = time.time() - age
+            os.utime(path, (moment, moment))
+        return job_id
+
+    def get_job(self, job_id):
+        return self.client.get(
+            f'/api/recipes/download_shopping_cart/{job_id}/')
+
+    def test_unclaimed_job_is_resubmitted(self):
+        job_id = self.lost_job('input')
+        self.assertEqual(self.get_job(job_id).status_code, 202)
+        deadline = time.monotonic() + 30
+        while (jobs.get_status(job_id, self.users[0]) == jobs.PENDING
+               and time.monotonic() < deadline):
+            time.sleep(0.1)
+        response = self.get_job(job_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content)[:4], b'%PDF')
+
+    def test_orphaned_job_fails(self):
+        response = self.get_job(self.lost_job())
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data['status'], jobs.FAILED)
+
+    def test_stale_claimed_job_fails(self):
+        job_id = self.lost_job(
+            'claimed', age=settings.SHOPPING_LIST_JOB_TIMEOUT + 1)
+        self.assertEqual(self.get_job(job_id).status_code, 500)
+
+    def test_running_job_stays_pending(self):
+        job_id = self.lost_job('claimed', age=1)
+        self.assertEqual(self.get_job(job_id).status_code, 202)
+
+    def test_claim_takes_fresh_time(self):
+        job_id = self.lost_job(
+            'input', age=settings.SHOPPING_LIST_JOB_TIMEOUT + 1)
+        self.assertEqual(jobs._claim(job_id)['user'], self.users[0].pk)
+        self.assertLess(
+            jobs._age(jobs._path(job_id, 'claimed')),
+            settings.SHOPPING_LIST_JOB_RETRY_AFTER)
+        self.assertEqual(self.get_job(job_id).status_code, 202)
+        self.assertIsNone(jobs._claim(job_id))
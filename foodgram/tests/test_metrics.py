@@ -0,0 +1,53 @@
+import re
+
+from django.test import override_settings
+
+from .base import APIDataTestCase
+
+
+class MetricsTests(APIDataTestCase):
+    """MetricsMiddleware учитывает запросы, /metrics отдаёт гистограммы."""
+
+    def get_metrics(self):
+        response = self.anonymous.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def get_value(self, metrics, name, view):
+        match = re.search(
+            rf'^{name}{{view="{re.escape(view)}"}} (\S+)$', metrics, re.M)
+        return float(match.group(1)) if match else 0
+
+    def test_requests_are_counted(self):
+        self.create_recipes(3)
+        before = self.get_metrics()
+        for _ in range(2):
+            self.assertEqual(
+                self.client.get('/api/recipes/').status_code, 200)
+        after = self.get_metrics()
+        view = 'RecipeViewSet.list'
+        for name in ('foodgram_request_duration_seconds_count',
+                     'foodgram_db_queries_count',
+                     'foodgram_serializer_duration_seconds_count'):
+            self.assertEqual(
+                self.get_value(after, name, view)
+                - self.get_value(before, name, view), 2, name)
+        self.assertGreater(
+            self.get_value(after, 'foodgram_db_queries_sum', view),
+            self.get_value(before, 'foodgram_db_queries_sum', view))
+        self.assertIn(
+            f'foodgram_request_duration_seconds_bucket{{view="{view}",'
+            f'le="+Inf"}}', after)
+
+    def test_metrics_render(self):
+        metrics = self.get_metrics()
+        for name in ('foodgram_request_duration_seconds',
+                     'foodgram_db_queries',
+                     'foodgram_db_duration_seconds',
+                     'foodgram_serializer_duration_seconds'):
+            self.assertIn(f'# TYPE {name} histogram', metrics)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_metrics_disabled(self):
+        self.assertEqual(self.anonymous.get('/metrics').status_code, 404)
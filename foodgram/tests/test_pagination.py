@@ -0,0 +1,60 @@
+from api.paginations import LimitCursorPagination
+from django.test import override_settings
+from django.utils import timezone
+from recipes.models import Recipe
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .base import APIDataTestCase
+
+
+class LimitCursorPaginationTests(APIDataTestCase):
+    """Пагинация по курсору (created, id) и кеш количества объектов."""
+
+    def paginate(self, queryset, url='/api/recipes/'):
+        paginator = LimitCursorPagination()
+        page = paginator.paginate_queryset(
+            queryset, Request(APIRequestFactory().get(url)))
+        return paginator.get_paginated_response(
+            [recipe.pk for recipe in page]).data
+
+    def walk(self, url, between_pages=None):
+        ids = []
+        while url is not None:
+            data = self.paginate(Recipe.objects.all(), url)
+            ids.extend(data['results'])
+            url = data['next']
+            if between_pages is not None:
+                between_pages()
+        return ids
+
+    def test_cursor_pages_with_equal_created(self):
+        recipes = self.create_recipes(10)
+        Recipe.objects.update(created=timezone.now())
+        self.assertEqual(
+            self.walk('/api/recipes/?limit=3'),
+            sorted((recipe.pk for recipe in recipes), reverse=True))
+
+    def test_new_recipes_do_not_shift_pages(self):
+        recipes = self.create_recipes(10)
+        self.assertEqual(
+            self.walk('/api/recipes/?limit=4',
+                      between_pages=lambda: self.create_recipes(1)),
+            [recipe.pk for recipe in sorted(
+                recipes, key=lambda recipe: (recipe.created, recipe.pk),
+                reverse=True)])
+
+    def test_count_disabled_by_default(self):
+        self.create_recipes(3)
+        self.assertNotIn('count', self.paginate(Recipe.objects.all()))
+
+    @override_settings(CURSOR_PAGINATION_COUNT=True)
+    def test_count_cache_follows_filters(self):
+        self.create_recipes(6)
+        self.assertEqual(self.paginate(Recipe.objects.all())['count'], 6)
+        self.create_recipes(3, author=self.users[1])
+        self.assertEqual(self.paginate(Recipe.objects.all())['count'], 6)
+        self.assertEqual(self.paginate(
+            Recipe.objects.filter(author=self.users[1]))['count'], 5)
+        self.assertEqual(self.paginate(
+            Recipe.objects.filter(author=self.users[2]))['count'], 2)
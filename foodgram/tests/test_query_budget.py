@@ -0,0 +1,117 @@
+from users.models import Subscription, User
+
+from .base import APIDataTestCase
+
+
+class RecipeQueryBudgetTests(APIDataTestCase):
+    """Число запросов к базе данных не зависит от размера страницы и числа
+    ингредиентов рецепта."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = self.create_recipes(30)
+
+    def test_list_is_constant_per_page(self):
+        for client, budget in ((self.anonymous, 4), (self.client, 5)):
+            for limit in (2, 20):
+                with self.subTest(limit=limit, budget=budget):
+                    with self.assertMaxQueries(budget):
+                        response = client.get(f'/api/recipes/?limit={limit}')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data['results']), limit)
+
+    def test_feed_is_constant_per_page(self):
+        for user in self.users[1:]:
+            self.client.post(f'/api/users/{user.pk}/subscribe/')
+        for limit in (2, 20):
+            with self.subTest(limit=limit):
+                with self.assertMaxQueries(4):
+                    response = self.client.get(
+                        f'/api/recipes/feed/?limit={limit}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_detail(self):
+        with self.assertMaxQueries(5):
+            response = self.client.get(f'/api/recipes/{self.recipes[0].pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['ingredients']), 5)
+
+    def test_create(self):
+        for ingredients in (2, 12):
+            with self.subTest(ingredients=ingredients):
+                with self.assertMaxQueries(12):
+                    response = self.client.post(
+                        '/api/recipes/', self.recipe_payload(ingredients),
+                        format='json')
+                self.assertEqual(response.status_code, 201, response.data)
+                self.assertEqual(
+                    len(response.data['ingredients']), ingredients)
+
+    def test_update(self):
+        recipe = self.create_recipes(1, author=self.users[0])[0]
+        self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        payload = self.recipe_payload(12)
+        del payload['image']
+        with self.assertMaxQueries(18):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/', payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['ingredients']), 12)
+
+    def test_update_removing_ingredients(self):
+        recipe = self.create_recipes(
+            1, author=self.users[0], ingredients=12)[0]
+        for user in self.users:
+            self.client_for(user).post(
+                f'/api/recipes/{recipe.pk}/shopping_cart/')
+        payload = self.recipe_payload(2)
+        del payload['image']
+        with self.assertMaxQueries(19):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/', payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['ingredients']), 2)
+
+
+class SubscriptionsQueryBudgetTests(APIDataTestCase):
+    """Число запросов списка подписок не зависит от числа авторов на
+    странице и их рецептов."""
+
+    def subscribe_to_authors(self, count):
+        authors = [
+            User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}', password='test-password')
+            for number in range(count)
+        ]
+        for author in authors:
+            self.create_recipes(4, author=author, ingredients=1)
+        Subscription.objects.bulk_create(
+            Subscription(subscriber=self.users[0], author=author)
+            for author in authors)
+
+    def test_subscriptions_are_constant_per_page(self):
+        for count in (2, 6):
+            with self.subTest(count=count):
+                Subscription.objects.filter(subscriber=self.users[0]).delete()
+                self.subscribe_to_authors(count)
+                for recipes_limit in ('', '?recipes_limit=3'):
+                    with self.assertMaxQueries(4):
+                        response = self.client.get(
+                            f'/api/users/subscriptions/{recipes_limit}')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data['results']), count)
+                    self.assertEqual(
+                        len(response.data['results'][0]['recipes']),
+                        3 if recipes_limit else 4)
+                User.objects.filter(username__startswith='author').delete()
+
+    def test_invalid_recipes_limit(self):
+        self.subscribe_to_authors(1)
+        for value in ('abc', '-1'):
+            with self.subTest(value=value):
+                response = self.client.get(
+                    f'/api/users/subscriptions/?recipes_limit={value}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipes_limit', response.data)
@@ -0,0 +1,44 @@
+import datetime
+import uuid
+from decimal import Decimal
+from unittest import skipIf
+
+from api import renderers
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+
+@skipIf(renderers.orjson is None, 'orjson не установлен')
+class FastJSONRendererTests(SimpleTestCase):
+    """FastJSONRenderer выводит то же, что и JSONRenderer."""
+
+    def assertSameOutput(self, data):
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(data),
+            JSONRenderer().render(data))
+
+    def test_same_output(self):
+        self.assertSameOutput({
+            'results': [{'id': 1, 'name': 'Рецепт', 'amount': 1.5,
+                         'tags': [], 'image': None, 'flag': True}],
+            1: 'ключ-число',
+            'decimal': Decimal('2.50'),
+            'uuid': uuid.UUID(int=5),
+            'separators': 'a b c',
+        })
+
+    def test_dates_match_drf_format(self):
+        moment = datetime.datetime(
+            2023, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc)
+        self.assertSameOutput({
+            'datetime': moment,
+            'naive': moment.replace(tzinfo=None),
+            'date': moment.date(),
+            'time': moment.time(),
+        })
+
+    def test_indent_falls_back(self):
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(
+                {'a': 1}, 'application/json; indent=2'),
+            JSONRenderer().render({'a': 1}, 'application/json; indent=2'))
@@ -0,0 +1,47 @@
+from django.db.models import Sum
+from recipes.models import RecipeIngredient, ShoppingListItem
+
+from .base import APIDataTestCase
+
+
+class ShoppingListTests(APIDataTestCase):
+    """Таблица списков покупок совпадает с суммой ингредиентов рецептов
+    в корзине."""
+
+    def assertShoppingListsConsistent(self):
+        expected = {
+            (row['recipe__shopping_cart__user'], row['ingredient']):
+                row['total']
+            for row in RecipeIngredient.objects.filter(
+                recipe__shopping_cart__isnull=False)
+            .values('recipe__shopping_cart__user', 'ingredient')
+            .annotate(total=Sum('amount')).order_by()
+        }
+        actual = {
+            (item.user_id, item.ingredient_id): item.amount
+            for item in ShoppingListItem.objects.all()
+        }
+        self.assertEqual(actual, expected)
+
+    def test_recipe_update_refreshes_carts(self):
+        recipe, other = self.create_recipes(
+            2, author=self.users[0], ingredients=8)
+        for user in self.users:
+            client = self.client_for(user)
+            client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+            client.post(f'/api/recipes/{other.pk}/shopping_cart/')
+        self.assertShoppingListsConsistent()
+        payload = self.recipe_payload(0)
+        del payload['image']
+        payload['ingredients'] = [
+            {'id': ingredient.pk, 'amount': 100}
+            for ingredient in self.ingredients[6:10]
+        ]
+        response = self.client.patch(
+            f'/api/recipes/{recipe.pk}/', payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertShoppingListsConsistent()
+        self.client.delete(f'/api/recipes/{other.pk}/shopping_cart/')
+        self.assertShoppingListsConsistent()
+        self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertShoppingListsConsistent()
@@ -1,15 +1,29 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
+from recipes.admin import CounterListFilter
 
 from .models import Subscription
 
 User = get_user_model()
 
 
+class RecipesCountFilter(CounterListFilter):
+    title = 'количество рецептов'
+    parameter_name = 'recipes_count'
+
+
+class SubscribersCountFilter(CounterListFilter):
+    title = 'количество подписчиков'
+    parameter_name = 'subscribers_count'
+
+
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
-    list_filter = ('email', 'username', 'is_staff', 'is_active')
+    list_display = ('username', 'email', 'first_name', 'last_name',
+                    'recipes_count', 'subscribers_count', 'is_staff')
+    list_filter = ('email', 'username', 'is_staff', 'is_active',
+                   RecipesCountFilter, SubscribersCountFilter)
     search_fields = ('username', 'email')
 
 
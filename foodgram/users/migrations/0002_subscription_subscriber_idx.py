@@ -0,0 +1,17 @@
+# Generated by Django 4.1.4 on 2026-10-18 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['subscriber', 'author'], name='subscription_subscriber_idx'),
+        ),
+    ]
@@ -3,7 +3,28 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """Денормализованные счётчики и отметки counter_fields меняются только
+    атомарными UPDATE из сервисов. Обычное сохранение существующего
+    объекта их не записывает, иначе значение, прочитанное раньше, затёрло
+    бы значение в базе данных. Явно перечисленные в update_fields поля
+    сохраняются."""
+    counter_fields = ()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if (update_fields is None and not self._state.adding
+                and not kwargs.get('force_insert') and not args):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     """Пользовательская модель пользователя."""
     email = models.EmailField(
         unique=True,
@@ -20,6 +41,12 @@ class User(AbstractUser):
         blank=True,
         verbose_name='Фамилия',
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False)
+    subscribers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0, editable=False)
+
+    counter_fields = ('recipes_count', 'subscribers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -47,6 +74,10 @@ class Subscription(models.Model):
                 fields=['author', 'subscriber'], name='unique_subscriptions'
             )
         ]
+        indexes = [
+            models.Index(fields=['subscriber', 'author'],
+                         name='subscription_subscriber_idx'),
+        ]
 
     def __str__(self):
         return f'{self.subscriber.username} подписан на {self.author.username}'
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Subscription
+
+User = get_user_model()
+
+
+def count_of(queryset, field):
+    """Подзапрос количества строк queryset для внешнего объекта по полю
+    field."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), Value(0))
+
+
+def change_recipes_count(author_ids, delta):
+    """Меняет счётчик рецептов у авторов author_ids."""
+    User.objects.filter(pk__in=author_ids).update(
+        recipes_count=Greatest(F('recipes_count') + delta, 0))
+
+
+def change_subscribers_count(author_ids, delta):
+    """Меняет счётчик подписчиков у авторов author_ids."""
+    User.objects.filter(pk__in=author_ids).update(
+        subscribers_count=Greatest(F('subscribers_count') + delta, 0))
+
+
+def recount_subscribers(author_ids):
+    """Пересчитывает счётчик подписчиков у авторов author_ids по таблице
+    подписок."""
+    User.objects.filter(pk__in=author_ids).update(
+        subscribers_count=count_of(Subscription.objects.all(), 'author'))
@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.cache import bump_version, feed_version_key
+
+from .models import Subscription
+from .services import change_subscribers_count
+
+
+@receiver(post_save, sender=Subscription)
+def increase_subscribers_count(instance, created, **kwargs):
+    if created:
+        change_subscribers_count([instance.author_id], 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrease_subscribers_count(instance, **kwargs):
+    change_subscribers_count([instance.author_id], -1)
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def invalidate_feed(instance, **kwargs):
+    key = feed_version_key(instance.subscriber_id)
+    transaction.on_commit(lambda: bump_version(key))